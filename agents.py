@@ -0,0 +1,189 @@
+"""
+Long-lived CrewAI agent registry for Local AI Avatar
+Builds the LLM wrapper and tool list once per model and reuses them across requests
+"""
+
+import queue
+import threading
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from crewai import Agent, Crew, Task
+from langchain.tools import Tool
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_community.llms import Ollama
+
+from tools import AgentTools
+
+logger = logging.getLogger(__name__)
+
+# Config keys that change the agent, its LLM or the behaviour of its tools
+AGENT_CONFIG_KEYS = (
+    'llm_model',
+    'agentic_tools_enabled',
+    'email_mode',
+    'calendar_mode',
+    'financial_api',
+)
+
+def _recording_tool(tool: Tool, tools_used: List[str]) -> Tool:
+    """Copy of a tool that appends its name to tools_used when called"""
+    def call(*args, **kwargs):
+        tools_used.append(tool.name)
+        return tool.func(*args, **kwargs)
+    return Tool(name=tool.name, func=call, description=tool.description)
+
+class FinalAnswerStreamer(BaseCallbackHandler):
+    """
+    LangChain callback that streams the agent's final answer as the LLM writes it
+
+    Every LLM call made by the agent is buffered. Once a call's output
+    contains the ReAct 'Final Answer:' marker, text after it is forwarded
+    token by token; thoughts and tool calls are never emitted. Iterate the
+    handler to receive the tokens; close() ends the iteration.
+    """
+
+    MARKER = 'Final Answer:'
+
+    def __init__(self):
+        self._tokens: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._buffer = ''
+        self._sent = 0
+        self.streamed = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._buffer, self._sent = '', 0
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self._buffer += token
+        marker = self._buffer.find(self.MARKER)
+        if marker < 0:
+            return
+        answer = self._buffer[marker + len(self.MARKER):].lstrip()
+        if len(answer) > self._sent:
+            self._tokens.put(answer[self._sent:])
+            self._sent = len(answer)
+            self.streamed = True
+
+    def close(self):
+        """Signal that the crew has finished"""
+        self._tokens.put(None)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            token = self._tokens.get()
+            if token is None:
+                return
+            yield token
+
+class AgentRegistry:
+    """
+    Caches the LLM wrapper and tools per model and hands out a fresh agent per request
+
+    CrewAI agents are not safe to share between concurrent crews: building a
+    Crew resets the agent's executor and execute_task mutates its tools and
+    state. Agent construction is cheap once its parts exist, so only the
+    parts are cached.
+    """
+
+    def __init__(self, config: dict, keyring):
+        """
+        Initialize agent registry
+
+        Args:
+            config: Application configuration
+            keyring: Keyring module passed through to AgentTools
+        """
+        self.config = config
+        self.keyring = keyring
+        self._parts: Dict[str, Tuple[Ollama, List]] = {}
+        self._lock = threading.Lock()
+
+    def _build_parts(self, model: str) -> Tuple[Ollama, List]:
+        """Create the LLM wrapper and tool list for a model"""
+        logger.info(f"Building LLM and tools for model {model}")
+        tools = []
+        if self.config.get('agentic_tools_enabled', True):
+            tools = AgentTools(self.config, self.keyring).get_all_tools()
+        return Ollama(model=model), tools
+
+    def get_parts(self, model: Optional[str] = None) -> Tuple[Ollama, List]:
+        """
+        Get the LLM wrapper and tools for a model, building them on first use
+
+        Args:
+            model: LLM model name (defaults to config['llm_model'])
+
+        Returns:
+            (llm, tools) shared by every agent for this model
+        """
+        model = model or self.config.get('llm_model', 'llama3')
+        with self._lock:
+            parts = self._parts.get(model)
+            if parts is None:
+                parts = self._build_parts(model)
+                self._parts[model] = parts
+            return parts
+
+    def get_agent(self, model: Optional[str] = None, tools_used: Optional[List[str]] = None,
+                  callbacks: Optional[List[BaseCallbackHandler]] = None) -> Agent:
+        """
+        Create an agent for one request from the cached LLM and tools
+
+        Args:
+            model: LLM model name (defaults to config['llm_model'])
+            tools_used: If given, the name of every tool the agent calls is appended to it
+            callbacks: LangChain callbacks for this request's LLM calls (e.g. FinalAnswerStreamer)
+
+        Returns:
+            New CrewAI agent, not shared with other requests
+        """
+        llm, tools = self.get_parts(model)
+        if tools_used is not None:
+            tools = [_recording_tool(tool, tools_used) for tool in tools]
+        if callbacks:
+            llm = Ollama(model=llm.model, callbacks=callbacks)  # Per-request wrapper; the client is stateless
+        return Agent(
+            role='AI Assistant',
+            goal='Process query with tools and memories',
+            backstory='Local AI with agentic capabilities',
+            llm=llm,
+            tools=list(tools)
+        )
+
+    def build_crew(self, description: str, tools_used: Optional[List[str]] = None,
+                   callbacks: Optional[List[BaseCallbackHandler]] = None) -> Crew:
+        """
+        Create a single-task crew around a fresh agent
+
+        Args:
+            description: Task description for this request
+            tools_used: Collects the names of the tools called during kickoff()
+            callbacks: LangChain callbacks attached to the agent's LLM
+
+        Returns:
+            Crew ready for kickoff()
+        """
+        agent = self.get_agent(tools_used=tools_used, callbacks=callbacks)
+        task = Task(description=description, agent=agent)
+        return Crew(agents=[agent], tasks=[task])
+
+    def update_config(self, new_config: dict) -> bool:
+        """
+        Swap in a new config, dropping cached LLMs and tools if a relevant key changed
+
+        Args:
+            new_config: Updated application configuration
+
+        Returns:
+            True if the cache was invalidated
+        """
+        changed = any(self.config.get(k) != new_config.get(k) for k in AGENT_CONFIG_KEYS)
+        with self._lock:
+            self.config = new_config
+            if changed:
+                logger.info("Agent configuration changed, clearing cached LLMs and tools")
+                self._parts.clear()
+        if changed:
+            self.get_parts()
+        return changed
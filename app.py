@@ -6,18 +6,26 @@ warnings.filterwarnings("ignore", message="Mixing V1 models and V2 models")
 warnings.filterwarnings("ignore", category=UserWarning, message="pkg_resources is deprecated as an API")
 warnings.filterwarnings("ignore", category=UserWarning, module="face_recognition_models")
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import json
+import base64
+import threading
+import zipfile
+import io
 import keyring
-import torch
-from stt import transcribe_audio
-from tts import text_to_speech
+import cv2
+from stt import transcribe_audio, get_engine as get_stt_engine, open_stream, get_stream, close_stream
+from tts import stream_speech, text_to_speech, get_engine as get_tts_engine, get_cache as get_tts_cache
+from speech_pipeline import SentenceSplitter, SpeechPipeline
+from visemes import viseme_timeline, wav_duration
 from memory import MemoryManager
-from tools import AgentTools
-from vision import analyze_image
-from landmarks import detect_landmarks
-from warp import warp_lips
-from crewai import Crew, Agent, Task
+from memory_queue import MemoryIngestQueue, exit_on_sigterm
+from response_cache import SemanticResponseCache
+from vision import analyze_images, analyze_frame, decode_image, get_models as get_vision_models
+from landmarks import detect_landmarks_image
+from image_cache import ImageResultCache
+from webcam import get_service as get_webcam_service
+from avatar_atlas import get_atlas
 import ollama  # Ensure ollama installed and running
 
 app = Flask(__name__)
@@ -26,75 +34,333 @@ app = Flask(__name__)
 with open('config.json', 'r') as f:
     config = json.load(f)
 
-memory_mgr = MemoryManager()
-tools = AgentTools(config, keyring)
+# Created by init_services(). TTS and face workers are spawned processes that
+# re-import this module, so nothing heavy may run or be imported at import time:
+# torch and crewai are imported in init_services(), and memory, vision and
+# landmarks load their libraries on first use.
+memory_mgr = memory_queue = response_cache = agent_registry = None
+tts_engine = tts_cache = vision_models = image_cache = webcam_service = None
 
-# M4 Pro optimization
-device = torch.device('mps') if torch.backends.mps.is_available() else torch.device('cpu')
-print(f"Using device: {device}")
+def init_services():
+    """Load models and start background services; runs once, in the main process"""
+    global memory_mgr, memory_queue, response_cache, agent_registry
+    global tts_engine, tts_cache, vision_models, image_cache, webcam_service
+    import torch
+    from agents import AgentRegistry
+
+    memory_mgr = MemoryManager(config)
+    memory_queue = MemoryIngestQueue(memory_mgr,
+                                     workers=config.get('memory_workers', 2),
+                                     maxsize=config.get('memory_queue_size', 64))
+    exit_on_sigterm()  # Let the queue and session store flush when the UI stops the backend
+    response_cache = SemanticResponseCache(memory_mgr, config)
+    agent_registry = AgentRegistry(config, keyring)
+    agent_registry.get_parts()  # Build the LLM and tools once at startup
+    get_stt_engine(config).load()  # Keep the whisper model resident
+    tts_engine = get_tts_engine(config)
+    tts_cache = get_tts_cache(config)
+    if tts_cache and config.get('tts_prewarm_phrases'):
+        threading.Thread(target=tts_cache.prewarm, args=(config['tts_prewarm_phrases'], text_to_speech),
+                         daemon=True).start()
+
+    # M4 Pro optimization
+    device = torch.device('mps') if torch.backends.mps.is_available() else torch.device('cpu')
+    print(f"Using device: {device}")
+    vision_models = get_vision_models(config, str(device))
+    if config.get('vision_enabled', True):
+        vision_models.warmup()
+    image_cache = ImageResultCache(max_entries=config.get('image_cache_size', 256),
+                                   use_phash=config.get('image_cache_phash', False),
+                                   max_distance=config.get('image_cache_phash_distance', 4))
+    threading.Thread(target=get_atlas, args=(config['avatar_path'],), daemon=True).start()  # Rebuilds only if the avatar changed
+    webcam_service = get_webcam_service(config)
+    if config.get('webcam_enabled', False):
+        try:
+            webcam_service.start()
+        except RuntimeError as e:
+            print(f"Webcam disabled: {e}")
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     try:
-        audio_data = request.files['audio'].read()
-        text = transcribe_audio(audio_data)
+        audio_file = request.files['audio']
+        text = transcribe_audio(audio_file.read(), audio_file.filename)
         return jsonify({'text': text})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/transcribe_stream', methods=['POST'])
+def transcribe_stream_start():
+    try:
+        return jsonify({'stream_id': open_stream(config)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/transcribe_stream/<stream_id>', methods=['POST'])
+def transcribe_stream_chunk(stream_id):
+    """Accepts a chunk of 16 kHz mono int16 PCM; returns transcripts completed so far"""
+    try:
+        events = get_stream(stream_id).feed(request.get_data())
+        return jsonify({'events': events})
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/transcribe_stream/<stream_id>/end', methods=['POST'])
+def transcribe_stream_end(stream_id):
+    try:
+        stream = close_stream(stream_id)
+        events = stream.feed(request.get_data()) + stream.finish()
+        return jsonify({'events': events, 'text': stream.text})
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def run_crew(query, context, tools_used=None, callbacks=None):
+    """Answer a query with the tool-using agent; tools_used collects the tools it calls"""
+    crew = agent_registry.build_crew(f"Handle: {query} with context: {context['knowledge']} history: {context['history']}",
+                                     tools_used, callbacks)
+    return crew.kickoff()
+
 @app.route('/generate_response', methods=['POST'])
 def generate_response():
     try:
         query = request.json['query']
-        history = memory_mgr.get_session_history()
-        context = memory_mgr.retrieve_knowledge(query)
-
-        agent = Agent(
-            role='AI Assistant',
-            goal='Process query with tools and memories',
-            backstory='Local AI with agentic capabilities',
-            llm=ollama.chat(model='llama3'),
-            tools=tools.get_all_tools()
-        )
-        task = Task(description=f'Handle: {query} with context: {context} history: {history}', agent=agent)
-        crew = Crew(agents=[agent], tasks=[task])
-        response = crew.kickoff()
-
-        memory_mgr.update_agent_memory(query, response)
-        memory_mgr.add_to_session(query, response)
-        memory_mgr.add_to_knowledge(response)  # Async-like
+        session_id = request.json.get('session_id', 'default')
+        cached = response_cache.get(query)
+        if cached is not None:
+            memory_mgr.add_to_session(query, cached, session_id)
+            return jsonify({'response': cached, 'cached': True})
+
+        tools_used = []
+        response = run_crew(query, memory_mgr.build_context(query, session_id), tools_used)
+
+        memory_queue.submit(query, response, session_id)
+        response_cache.put(query, response, tools_used)
 
         return jsonify({'response': response})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/tts', methods=['POST'])
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/generate_response_stream', methods=['POST'])
+def generate_response_stream():
+    """
+    Streaming variant of /generate_response.
+
+    Emits `token` events, then `memory` once the exchange is handed to the
+    ingest queue and `done` with the full answer.
+
+    By default (`tools` follows agentic_tools_enabled) the query goes through
+    the tool-using agent like /generate_response: a `status` event marks the
+    tool phase, then the tokens of the agent's final answer stream as the
+    LLM writes them. With `tools: false` the model answers directly, skipping
+    the agent's reasoning steps, but calendar, email, finance and file tools
+    are unavailable.
+
+    With `speak: true`, each sentence is synthesized as soon as it is
+    complete and sent as an `audio` event (base64 WAV plus its viseme
+    timeline), in order.
+    """
+    query = request.json['query']
+    session_id = request.json.get('session_id', 'default')
+    speak = request.json.get('speak', False)
+    use_tools = request.json.get('tools', config.get('agentic_tools_enabled', True))
+    cached = response_cache.get(query)
+    if cached is not None:
+        memory_mgr.add_to_session(query, cached, session_id)
+        token_source = iter([cached])
+    elif use_tools:
+        context = memory_mgr.build_context(query, session_id)
+        token_source = None  # Produced inside generate() so the status event goes out first
+    else:
+        context = memory_mgr.build_context(query, session_id)
+        messages = [
+            {'role': 'system', 'content': f"You are a local AI assistant. Relevant knowledge:\n{context['knowledge']}\nRecent conversation:\n{context['history']}"},
+            {'role': 'user', 'content': query}
+        ]
+        token_source = (chunk['message']['content']
+                        for chunk in ollama.chat(model=config.get('llm_model', 'llama3'), messages=messages, stream=True))
+
+    def audio_events(segments):
+        for index, sentence, audio in segments:
+            yield sse_event('audio', {'index': index, 'text': sentence,
+                                      'audio': base64.b64encode(audio).decode('ascii'),
+                                      'visemes': viseme_timeline(sentence, wav_duration(audio))})
+
+    def run_crew_streaming(tools_used, result):
+        """Run the agent on a worker thread; its final-answer tokens arrive through the returned streamer"""
+        from agents import FinalAnswerStreamer
+        streamer = FinalAnswerStreamer()
+
+        def work():
+            try:
+                result['response'] = str(run_crew(query, context, tools_used, [streamer]))
+            except Exception as e:
+                result['error'] = e
+            finally:
+                streamer.close()
+
+        threading.Thread(target=work, name='crew-stream', daemon=True).start()
+        return streamer
+
+    def generate():
+        tokens = []
+        tools_used = []
+        crew_result = None
+        splitter = SentenceSplitter()
+        pipeline = SpeechPipeline(text_to_speech, workers=config.get('tts_pipeline_workers', 1)) if speak else None
+
+        def emit(token):
+            tokens.append(token)
+            yield sse_event('token', {'token': token})
+            if pipeline:
+                for sentence in splitter.feed(token):
+                    pipeline.submit(sentence)
+                yield from audio_events(pipeline.ready())
+
+        try:
+            source = token_source
+            if source is None:
+                yield sse_event('status', {'stage': 'tools'})
+                crew_result = {}
+                source = run_crew_streaming(tools_used, crew_result)
+            for token in source:
+                if token:
+                    yield from emit(token)
+            if crew_result is None:
+                response = ''.join(tokens)
+            else:
+                if 'error' in crew_result:
+                    raise crew_result['error']
+                response = crew_result['response']
+                if not tokens:  # The answer did not come through a streamed LLM call
+                    yield from emit(response)
+
+            if cached is None:
+                queued = memory_queue.submit(query, response, session_id)
+                yield sse_event('memory', {'status': 'queued' if queued else 'updated'})
+                response_cache.put(query, response, tools_used)
+
+            if pipeline:
+                for sentence in splitter.flush():
+                    pipeline.submit(sentence)
+                yield from audio_events(pipeline.drain())
+
+            yield sse_event('done', {'response': response, 'cached': cached is not None})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            if pipeline:
+                pipeline.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/tts', methods=['GET', 'POST'])
 def tts():
+    """
+    Stream synthesized speech as audio/wav; GET ?text= lets an <audio> element play it directly.
+
+    With visemes=1 (or `visemes: true`) the full clip is returned as JSON
+    with a time-aligned viseme track instead.
+    """
     try:
-        text = request.json['text']
-        audio_path = text_to_speech(text)
-        return jsonify({'audio_path': audio_path})
+        params = request.args if request.method == 'GET' else request.json
+        text = params['text']
+        if params.get('visemes') in (True, '1', 'true'):
+            audio = text_to_speech(text)
+            duration = wav_duration(audio)
+            return jsonify({'audio': base64.b64encode(audio).decode('ascii'), 'duration': duration,
+                            'visemes': viseme_timeline(text, duration)})
+        return Response(stream_with_context(stream_speech(text)), mimetype='audio/wav',
+                        headers={'Cache-Control': 'no-cache'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def analysis_namespace():
+    """Image cache namespace for /analyze_image; results differ with the detector settings"""
+    options = ','.join(f'{k}={v}' for k, v in sorted(vision_models.face_options.items()))
+    return f'analyze:imgsz={vision_models.imgsz},{options}'
+
 @app.route('/analyze_image', methods=['POST'])
 def analyze_img():
     try:
-        image_file = request.files['image']
-        image_path = 'temp_image.jpg'
-        image_file.save(image_path)
-        result = analyze_image(image_path)
+        data = request.files['image'].read()
+        img = decode_image(data)
+        if img is None:
+            return jsonify({'error': 'Invalid image'}), 400
+        fingerprint = image_cache.fingerprint(data, img)
+        namespace = analysis_namespace()
+        result = image_cache.get(namespace, fingerprint)
+        if result is None:
+            result = analyze_frame(img)
+            image_cache.put(namespace, fingerprint, result)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+@app.route('/analyze_images', methods=['POST'])
+def analyze_imgs():
+    """Batch analysis: any number of `images` files and/or a zip `archive` of images"""
+    try:
+        items = [(f.filename, f.read()) for f in request.files.getlist('images')]
+        if 'archive' in request.files:
+            with zipfile.ZipFile(io.BytesIO(request.files['archive'].read())) as archive:
+                items += [(name, archive.read(name)) for name in archive.namelist()
+                          if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('__MACOSX/')]
+        if not items:
+            return jsonify({'error': 'No images provided'}), 400
+        results = analyze_images(items, batch_size=config.get('vision_batch_size', 8),
+                                 face_workers=config.get('vision_face_workers', 2))
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/webcam/latest', methods=['GET'])
+def webcam_latest():
+    if not webcam_service.running:
+        return jsonify({'error': 'Webcam disabled'}), 409
+    return jsonify(webcam_service.latest())
+
+@app.route('/webcam/stream', methods=['GET'])
+def webcam_stream():
+    """SSE feed of detection results, one event per processed frame"""
+    if not webcam_service.running:
+        return jsonify({'error': 'Webcam disabled'}), 409
+
+    def generate():
+        last_frame_id = 0
+        while webcam_service.running:
+            result = webcam_service.wait_for_update(last_frame_id)
+            if result is None:
+                yield ': keep-alive\n\n'
+                continue
+            last_frame_id = result['frame_id']
+            yield sse_event('vision', result)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/landmarks', methods=['POST'])
 def landmarks():
     try:
-        image_file = request.files['image']
-        image_path = 'temp_image.jpg'
-        image_file.save(image_path)
-        landmarks = detect_landmarks(image_path)
+        data = request.files['image'].read()
+        img = decode_image(data)
+        if img is None:
+            return jsonify({'error': 'Invalid image'}), 400
+        fingerprint = image_cache.fingerprint(data, img)
+        landmarks = image_cache.get('landmarks', fingerprint)
+        if landmarks is None:
+            landmarks = detect_landmarks_image(img) or []  # Cache "no face" as [] so it is not recomputed
+            image_cache.put('landmarks', fingerprint, landmarks)
         return jsonify({'landmarks': landmarks})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -103,13 +369,24 @@ def landmarks():
 def warp():
     try:
         data = request.json
-        image_path = data['image_path']
+        atlas = get_atlas(data.get('image_path', config['avatar_path']))
         visemes = data['visemes']
-        frames = warp_lips(image_path, visemes)
+        if data.get('indices'):
+            # Cheap path: the client fetches each atlas frame once and indexes into them
+            return jsonify({'indices': atlas.indices(visemes), 'visemes': atlas.manifest['visemes']})
+        frames = atlas.frames(visemes)
         return jsonify({'frames': [frame.tolist() for frame in frames]})  # Serialize
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/atlas/<viseme>', methods=['GET'])
+def atlas_frame(viseme):
+    try:
+        ok, png = cv2.imencode('.png', get_atlas(config['avatar_path']).frame(viseme))
+        return Response(png.tobytes(), mimetype='image/png', headers={'Cache-Control': 'max-age=3600'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/update_config', methods=['POST'])
 def update_config():
     try:
@@ -118,6 +395,18 @@ def update_config():
             json.dump(new_config, f)
         global config
         config = new_config
+        agent_registry.update_config(new_config)
+        response_cache.configure(new_config)
+        if new_config.get('avatar_path'):
+            threading.Thread(target=get_atlas, args=(new_config['avatar_path'],), daemon=True).start()
+        if new_config.get('webcam_enabled', False):
+            try:
+                webcam_service.start()
+            except RuntimeError as e:
+                # The rest of the config is already applied; report the camera separately
+                return jsonify({'status': 'updated', 'webcam_error': str(e)})
+        else:
+            webcam_service.stop()
         return jsonify({'status': 'updated'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -131,9 +420,24 @@ def set_key():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    try:
+        return jsonify({
+            'embedding_cache': memory_mgr.embedding_cache.stats(),
+            'response_cache': response_cache.stats(),
+            'tts_cache': tts_cache.stats() if tts_cache else None,
+            'tts_pool': tts_engine.stats() if hasattr(tts_engine, 'stats') else None,
+            'image_cache': image_cache.stats()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/')
 def home():
     return "Hello, the app is running successfully!"
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    init_services()
+    # The reloader would run a second copy of every model and worker pool
+    app.run(host='0.0.0.0', port=8000, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Viseme frame atlas for Local AI Avatar
+Renders one frame per viseme for the avatar once, stores them memory-mapped, and serves lookups
+"""
+
+import hashlib
+import json
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from landmarks import detect_landmarks_image
+from visemes import VISEMES
+from warp import warp_lips
+
+logger = logging.getLogger(__name__)
+
+ATLAS_VERSION = 2  # Bump when the warp changes so stale atlases are rebuilt
+
+def _file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class VisemeAtlas:
+    """Memory-mapped frames for one avatar, indexed by viseme"""
+
+    def __init__(self, directory: Path, manifest: Dict):
+        """
+        Open an atlas that build_atlas() has written
+
+        Args:
+            directory: Atlas directory
+            manifest: Parsed manifest.json
+        """
+        self.directory = directory
+        self.manifest = manifest
+        self.index = {v: i for i, v in enumerate(manifest['visemes'])}
+        self.frames_array = np.load(directory / manifest['frames_file'], mmap_mode='r')
+
+    def frame(self, viseme: str) -> np.ndarray:
+        """Frame for a viseme; unknown codes fall back to the rest pose"""
+        return self.frames_array[self.index.get(viseme, self.index['X'])]
+
+    def indices(self, visemes: List[str]) -> List[int]:
+        """Atlas indices for a viseme sequence"""
+        return [self.index.get(v, self.index['X']) for v in visemes]
+
+    def frames(self, visemes: List[str]) -> List[np.ndarray]:
+        """Frames for a viseme sequence"""
+        return [self.frames_array[i] for i in self.indices(visemes)]
+
+def build_atlas(avatar_path: str, directory: Path) -> VisemeAtlas:
+    """
+    Render every viseme for the avatar and write frames plus manifest
+
+    Args:
+        avatar_path: Avatar image
+        directory: Output directory
+
+    Returns:
+        The freshly built atlas
+    """
+    start = time.perf_counter()
+    image = cv2.imread(avatar_path)
+    if image is None:
+        raise ValueError(f"Could not read avatar image: {avatar_path}")
+    landmarks = detect_landmarks_image(image)
+    if not landmarks:
+        raise ValueError("No face detected")
+
+    rendered = warp_lips(avatar_path, list(VISEMES), landmarks)
+    directory.mkdir(parents=True, exist_ok=True)
+    frames = np.lib.format.open_memmap(directory / 'frames.npy', mode='w+', dtype=np.uint8,
+                                       shape=(len(VISEMES),) + image.shape)
+    for i, frame in enumerate(rendered):
+        frames[i] = frame
+    frames.flush()
+    del frames
+
+    manifest = {
+        'version': ATLAS_VERSION,
+        'avatar_path': avatar_path,
+        'avatar_sha256': _file_sha256(avatar_path),
+        'visemes': list(VISEMES),
+        'frames_file': 'frames.npy',
+        'shape': list(image.shape),
+        'built_at': time.time()
+    }
+    with open(directory / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Built viseme atlas for {avatar_path} in {time.perf_counter() - start:.2f}s")
+    return VisemeAtlas(directory, manifest)
+
+def load_atlas(avatar_path: str, directory: Path) -> Optional[VisemeAtlas]:
+    """Open the atlas in directory if it was built from this exact avatar, else None"""
+    manifest_path = directory / 'manifest.json'
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if (manifest.get('version') != ATLAS_VERSION
+            or manifest.get('visemes') != list(VISEMES)
+            or manifest.get('avatar_sha256') != _file_sha256(avatar_path)):
+        return None
+    return VisemeAtlas(directory, manifest)
+
+_atlases: Dict[str, tuple] = {}  # avatar_path -> (mtime, atlas)
+_atlas_lock = threading.Lock()
+
+def get_atlas(avatar_path: str, root: str = 'assets/atlas') -> VisemeAtlas:
+    """
+    Atlas for an avatar, building it only when the avatar image has changed
+
+    Args:
+        avatar_path: Avatar image
+        root: Directory holding one atlas per avatar
+
+    Returns:
+        Loaded atlas
+    """
+    directory = Path(root) / hashlib.sha256(str(Path(avatar_path).resolve()).encode()).hexdigest()[:16]
+    mtime = Path(avatar_path).stat().st_mtime
+    with _atlas_lock:
+        cached = _atlases.get(avatar_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        atlas = load_atlas(avatar_path, directory) or build_atlas(avatar_path, directory)
+        _atlases[avatar_path] = (mtime, atlas)
+        return atlas
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with open('config.json') as f:
+        config = json.load(f)
+    atlas = get_atlas(config['avatar_path'])
+    print(f"Atlas ready: {atlas.directory} ({len(atlas.index)} visemes)")
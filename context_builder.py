@@ -0,0 +1,110 @@
+"""
+Prompt context assembly for Local AI Avatar
+Fits session history and retrieved knowledge into a token budget
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Llama-family BPE tokenizers average about four characters of English per token.
+# The Ollama model's own tokenizer is not exposed, so counts are estimates either way;
+# a length heuristic keeps this dependency-free and fully offline.
+CHARS_PER_TOKEN = 4
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text
+
+    Estimated from length, as an approximation of the Ollama model's own tokenizer.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Token count
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text down to at most max_tokens
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token limit
+
+    Returns:
+        Text, truncated with an ellipsis if it did not fit
+    """
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text) <= max_tokens:
+        return text
+    return text[:(max_tokens - 1) * CHARS_PER_TOKEN].rstrip() + '…'
+
+class ContextBuilder:
+    """Packs history and knowledge into a prompt by priority"""
+
+    def __init__(self, budget: int = 2048, history_share: float = 0.5, min_entry_tokens: int = 32):
+        """
+        Initialize context builder
+
+        Args:
+            budget: Total tokens available for query, history and knowledge
+            history_share: Fraction of the remaining budget reserved for history;
+                whatever history leaves unused goes to knowledge
+            min_entry_tokens: Smallest truncated entry worth including
+        """
+        self.budget = budget
+        self.history_share = history_share
+        self.min_entry_tokens = min_entry_tokens
+
+    def _pack(self, entries: List[str], budget: int) -> Tuple[List[str], int]:
+        """Take entries in priority order, truncating the last one that partly fits"""
+        packed, used = [], 0
+        for entry in entries:
+            remaining = budget - used
+            tokens = count_tokens(entry)
+            if tokens <= remaining:
+                packed.append(entry)
+                used += tokens
+            else:
+                if remaining >= self.min_entry_tokens:
+                    entry = truncate_tokens(entry, remaining)
+                    packed.append(entry)
+                    used += count_tokens(entry)
+                break
+        return packed, used
+
+    def build(self, query: str, history: List[Tuple[str, str]], knowledge: List[str]) -> Dict[str, object]:
+        """
+        Assemble prompt context
+
+        Args:
+            query: Current user query (always kept in full)
+            history: (query, response) pairs, newest first
+            knowledge: Retrieved knowledge, most relevant first
+
+        Returns:
+            Dict with 'history' and 'knowledge' text plus the 'tokens' used
+        """
+        available = max(0, self.budget - count_tokens(query))
+
+        history_entries = [f'Q: {q} A: {r}' for q, r in history]
+        history_packed, history_used = self._pack(history_entries, int(available * self.history_share))
+        knowledge_packed, knowledge_used = self._pack(knowledge, available - history_used)
+
+        dropped = len(history_entries) - len(history_packed) + len(knowledge) - len(knowledge_packed)
+        if dropped:
+            logger.debug(f"Context budget dropped {dropped} entries")
+
+        return {
+            # Oldest first reads naturally in the prompt
+            'history': '\n'.join(reversed(history_packed)),
+            'knowledge': '\n'.join(knowledge_packed),
+            'tokens': count_tokens(query) + history_used + knowledge_used
+        }
@@ -0,0 +1,168 @@
+"""
+Embedding cache for Local AI Avatar
+Content-hash keyed LRU of sentence embeddings, optionally backed by SQLite
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """LRU cache of embeddings keyed by a hash of model name and text"""
+
+    def __init__(self, model_name: str, max_entries: int = 10000, db_path: Optional[str] = None,
+                 max_disk_entries: int = 100000):
+        """
+        Initialize embedding cache
+
+        Args:
+            model_name: Embedding model name, part of every key
+            max_entries: Maximum number of embeddings kept in memory
+            db_path: Optional SQLite file used as a second-level cache
+            max_disk_entries: Maximum number of embeddings kept in the SQLite file
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+        self.encoded = 0
+
+        self.conn = None
+        self._db_lock = threading.Lock()  # Disk writes happen outside the in-memory lock
+        self._touched: Dict[str, float] = {}  # Disk hits whose last_used is written with the next put
+        self._disk_count = 0
+        if db_path:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            # WAL with synchronous=NORMAL: commits do not fsync, so a put on the request path stays cheap
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)')
+            cols = {row[1] for row in self.conn.execute('PRAGMA table_info(embeddings)')}
+            if 'last_used' not in cols:
+                self.conn.execute('ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)')
+            self.conn.commit()
+            self._disk_count = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def key(self, text: str) -> str:
+        """Content hash for a text under this model"""
+        return hashlib.sha256(f'{self.model_name}\0{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up cached embeddings
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Mapping of text to embedding for every hit
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for text in texts:
+                k = self.key(text)
+                vector = self._entries.get(k)
+                if vector is not None:
+                    self._entries.move_to_end(k)
+                    found[text] = vector
+                    self.hits += 1
+                else:
+                    missing.append((text, k))
+
+            self.misses += len(missing)
+
+        if missing and self.conn is not None:
+            now = time.time()
+            with self._db_lock:
+                rows = [(text, k, self.conn.execute('SELECT vector FROM embeddings WHERE key = ?', (k,)).fetchone())
+                        for text, k in missing]
+                for _, k, row in rows:
+                    if row:
+                        self._touched[k] = now
+            with self._lock:
+                for text, k, row in rows:
+                    if row:
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._store(k, vector)
+                        found[text] = vector
+                        self.disk_hits += 1
+                        self.misses -= 1
+        return found
+
+    def put_many(self, texts: List[str], vectors, encode_seconds: float = 0.0):
+        """
+        Store freshly encoded embeddings
+
+        Args:
+            texts: Encoded texts
+            vectors: Embeddings in the same order as texts
+            encode_seconds: Time the encoder spent producing them
+        """
+        now = time.time()
+        with self._lock:
+            self.encode_seconds += encode_seconds
+            self.encoded += len(texts)
+            rows = []
+            for text, vector in zip(texts, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                k = self.key(text)
+                self._store(k, vector)
+                rows.append((k, vector.tobytes(), now))
+        if self.conn is not None and rows:
+            self._write(rows)
+
+    def _write(self, rows):
+        """Insert rows, record pending disk hits and evict least recently used rows past max_disk_entries"""
+        with self._db_lock:
+            touched, self._touched = self._touched, {}
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)',
+                                      rows)
+                self.conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?',
+                                      [(t, k) for k, t in touched.items()])
+                self._disk_count += len(rows)  # Overcounts replaced keys; corrected below
+                if self._disk_count > self.max_disk_entries:
+                    self._disk_count = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+                    excess = self._disk_count - self.max_disk_entries
+                    if excess > 0:
+                        self.conn.execute('DELETE FROM embeddings WHERE key IN '
+                                          '(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (excess,))
+                        self._disk_count -= excess
+
+    def _store(self, k: str, vector: np.ndarray):
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        self._entries[k] = vector
+        self._entries.move_to_end(k)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and estimated encoder time saved"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            avg_encode = self.encode_seconds / self.encoded if self.encoded else 0.0
+            return {
+                'entries': len(self._entries),
+                'disk_entries': self._disk_count,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'encode_seconds': self.encode_seconds,
+                'estimated_seconds_saved': (self.hits + self.disk_hits) * avg_encode
+            }
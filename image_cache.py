@@ -0,0 +1,123 @@
+"""
+Image result cache for Local AI Avatar
+LRU of analysis results keyed by content hash, with perceptual-hash matching for near-duplicates
+"""
+
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def dhash(img: np.ndarray, size: int = 8) -> int:
+    """
+    64-bit difference hash of a BGR image
+
+    Robust to re-encoding and resizing, so recompressed copies of the same
+    screenshot or avatar land within a few bits of each other.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(''.join('1' if b else '0' for b in bits), 2)
+
+class ImageResultCache:
+    """Per-endpoint LRU of image analysis results"""
+
+    def __init__(self, max_entries: int = 256, use_phash: bool = False, max_distance: int = 4, min_bits: int = 8):
+        """
+        Initialize image result cache
+
+        Args:
+            max_entries: Results kept across all namespaces
+            use_phash: Also match near-duplicate images by perceptual hash
+            max_distance: Largest Hamming distance between hashes that counts as a match
+            min_bits: Hashes with fewer set (or unset) bits than this come from low-texture
+                images, where unrelated images collide, and are never near-matched
+        """
+        self.max_entries = max_entries
+        self.use_phash = use_phash
+        self.max_distance = max_distance
+        self.min_bits = min_bits
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def fingerprint(self, data: bytes, img: Optional[np.ndarray] = None) -> Tuple[str, Optional[int]]:
+        """
+        Content hash of the upload plus, when enabled, a perceptual hash of the decoded image
+
+        Args:
+            data: Encoded upload bytes
+            img: Decoded image, needed for the perceptual hash
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        phash = dhash(img) if self.use_phash and img is not None else None
+        if phash is not None and not self.min_bits <= bin(phash).count('1') <= 64 - self.min_bits:
+            phash = None  # Flat images (solid colours, plain screenshots) all hash alike
+        return digest, phash
+
+    def get(self, namespace: str, fingerprint: Tuple[str, Optional[int]]) -> Optional[Any]:
+        """
+        Cached result for an image
+
+        Args:
+            namespace: Which analysis the result belongs to (e.g. 'analyze', 'landmarks')
+            fingerprint: Value from fingerprint()
+
+        Returns:
+            Cached result or None
+        """
+        digest, phash = fingerprint
+        with self._lock:
+            key = (namespace, digest)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+            if phash is not None:
+                for (ns, other), (other_phash, result) in reversed(self._entries.items()):
+                    if ns == namespace and other_phash is not None \
+                            and bin(phash ^ other_phash).count('1') <= self.max_distance:
+                        self._entries.move_to_end((ns, other))
+                        self.near_hits += 1
+                        return result
+            self.misses += 1
+        return None
+
+    def put(self, namespace: str, fingerprint: Tuple[str, Optional[int]], result: Any):
+        """
+        Store a result
+
+        Args:
+            namespace: Which analysis produced it
+            fingerprint: Value from fingerprint()
+            result: JSON-serializable result; None is not cached, since get() uses it to mean a miss
+        """
+        if result is None:
+            return
+        digest, phash = fingerprint
+        with self._lock:
+            self._entries[(namespace, digest)] = (phash, result)
+            self._entries.move_to_end((namespace, digest))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'near_duplicate_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0
+            }
@@ -1,12 +1,24 @@
+import threading
 import cv2
-import mediapipe as mp
 
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1)
+_face_mesh = None
+_face_mesh_lock = threading.Lock()  # Guards creation and use; the MediaPipe graph is not thread-safe
+
+def _get_face_mesh():
+    """MediaPipe FaceMesh, built on first use so importing this module stays cheap"""
+    global _face_mesh
+    if _face_mesh is None:
+        import mediapipe as mp
+        _face_mesh = mp.solutions.face_mesh.FaceMesh(static_image_mode=True, max_num_faces=1)
+    return _face_mesh
 
 def detect_landmarks(image_path):
-    image = cv2.imread(image_path)
-    results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return detect_landmarks_image(cv2.imread(image_path))
+
+def detect_landmarks_image(image):
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    with _face_mesh_lock:
+        results = _get_face_mesh().process(rgb)
     if results.multi_face_landmarks:
         return [[p.x, p.y, p.z] for p in results.multi_face_landmarks[0].landmark]
-    return []
\ No newline at end of file
+    return []
@@ -1,15 +1,27 @@
 // Placeholder for Wawa; assume library installed
 const Lipsync = require('wawa-lipsync');  // npm install wawa-lipsync
 
-function startLipSync(audioPath) {
-  const lipsync = new Lipsync();
+function startLipSync(audioPath, visemes) {
   const audio = new Audio(audioPath);
   audio.play();
+  if (visemes && visemes.length) {
+    // Server-provided timeline: look up the current viseme instead of analysing audio
+    let i = 0;
+    const tick = () => {
+      while (i < visemes.length - 1 && audio.currentTime >= visemes[i].end) i++;
+      updateMorph({ code: visemes[i].viseme });
+      if (!audio.ended) requestAnimationFrame(tick);
+    };
+    requestAnimationFrame(tick);
+    return audio;
+  }
+  const lipsync = new Lipsync();
   lipsync.start(audio);
   lipsync.on('viseme', viseme => {
     // Call from avatar.js
     updateMorph(viseme);
   });
+  return audio;
 }
 
-module.exports = startLipSync;
\ No newline at end of file
+module.exports = startLipSync;
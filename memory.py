@@ -1,37 +1,175 @@
-import sqlite3
-from chromadb import Client
-from sentence_transformers import SentenceTransformer
+import hashlib
+import time
+import logging
 import ollama
+from embedding_cache import EmbeddingCache
+from session_store import SessionStore
+from context_builder import ContextBuilder, count_tokens
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different copies of a text compare equal"""
+    return ' '.join(text.split()).lower()
+
+def knowledge_id(text):
+    """Stable, content-addressed Chroma id for a knowledge entry"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+def chunk_text(text, chunk_chars, overlap=0):
+    """Split text into chunks of at most chunk_chars, breaking on whitespace where possible"""
+    text = text.strip()
+    if chunk_chars <= 0 or len(text) <= chunk_chars:
+        return [text] if text else []
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            split = text.rfind(' ', start, end)
+            if split > start:
+                end = split
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
 
 class MemoryManager:
-    def __init__(self):
-        self.conn = sqlite3.connect('memory.db')
-        self.conn.execute('CREATE TABLE IF NOT EXISTS session (query TEXT, response TEXT)')
-        self.conn.execute('CREATE TABLE IF NOT EXISTS agent (key TEXT, value TEXT)')
-        self.chroma = Client()
+    def __init__(self, config=None):
+        import chromadb  # Heavy; imported here so spawned workers that import this module skip it
+        from sentence_transformers import SentenceTransformer
+        config = config or {}
+        self.store = SessionStore('memory.db',
+                                  max_history=config.get('max_session_history', 50),
+                                  commit_batch=config.get('session_commit_batch', 1),
+                                  flush_interval=config.get('session_flush_interval', 2.0))
+        if config.get('knowledge_persist', True):
+            # On-disk store: the knowledge collection survives restarts without re-embedding
+            self.chroma = chromadb.PersistentClient(path=config.get('knowledge_store_path', 'knowledge_store'))
+        else:
+            self.chroma = chromadb.Client()
         self.collection = self.chroma.get_or_create_collection(name='knowledge')
+        logger.info(f"Knowledge store loaded with {self.collection.count()} entries")
         self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.batch_size = config.get('embedding_batch_size', 32)
+        self.chunk_chars = config.get('knowledge_chunk_chars', 0)
+        self.history_turns = config.get('context_history_turns', 10)
+        self.knowledge_results = config.get('context_knowledge_results', 5)
+        self.context_builder = ContextBuilder(budget=config.get('context_token_budget', 2048),
+                                              history_share=config.get('context_history_share', 0.5))
+        self.embedding_cache = EmbeddingCache('all-MiniLM-L6-v2',
+                                              max_entries=config.get('embedding_cache_size', 10000),
+                                              db_path=config.get('embedding_cache_path'),
+                                              max_disk_entries=config.get('embedding_cache_disk_size', 100000))
 
-    def add_to_session(self, query, response):
-        self.conn.execute('INSERT INTO session VALUES (?, ?)', (query, response))
-        self.conn.commit()
+    def add_to_session(self, query, response, session_id='default'):
+        self.store.add(query, response, session_id)
 
-    def get_session_history(self):
-        cursor = self.conn.execute('SELECT * FROM session ORDER BY rowid DESC LIMIT 5')
-        return '\n'.join([f'Q: {q} A: {r}' for q, r in cursor.fetchall()])
+    def get_session_history(self, session_id='default'):
+        rows = self.store.recent(5, session_id)
+        return '\n'.join([f'Q: {q} A: {r}' for q, r in rows])
+
+    def count_tokens(self, text):
+        return count_tokens(text)
+
+    def build_context(self, query, session_id='default'):
+        """History and knowledge for a prompt, packed into the configured token budget"""
+        history = self.store.recent(self.history_turns, session_id)
+        knowledge = self.retrieve_knowledge(query, n_results=self.knowledge_results)
+        return self.context_builder.build(query, history, knowledge)
 
     def update_agent_memory(self, query, response):
         prompt = f"Extract user preferences or facts from: {query} {response}"
         extracted = ollama.generate(model='llama3', prompt=prompt)['response']  # Assume dict format
         # Parse and insert; simplified
-        self.conn.execute('INSERT OR REPLACE INTO agent VALUES (?, ?)', ('example_key', extracted))
-        self.conn.commit()
+        self.store.set_agent_value('example_key', extracted)
+
+    def embed(self, texts, batch_size=None):
+        """Embed texts, encoding only the ones missing from the embedding cache"""
+        batch_size = batch_size or self.batch_size
+        cached = self.embedding_cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t in texts if t not in cached))
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embedder.encode(missing, batch_size=batch_size)
+            self.embedding_cache.put_many(missing, vectors, time.perf_counter() - start)
+            cached.update(zip(missing, vectors))
+        return [[float(x) for x in cached[t]] for t in texts]
 
-    def retrieve_knowledge(self, query):
-        embedding = self.embedder.encode([query])[0].tolist()
-        results = self.collection.query(query_embeddings=[embedding], n_results=3)
-        return [doc['metadata']['text'] for doc in results['documents'][0]] if results['distances'] else []
+    def retrieve_knowledge(self, query, n_results=3):
+        embedding = self.embed([query])[0]
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results)
+        return [meta['text'] for meta in results['metadatas'][0]] if results['metadatas'] else []
 
     def add_to_knowledge(self, text):
-        embedding = self.embedder.encode([text])[0].tolist()
-        self.collection.add(embeddings=[embedding], metadatas=[{'text': text}], ids=[str(hash(text))])
\ No newline at end of file
+        self.add_many([text])
+
+    def add_many(self, texts, metadatas=None, batch_size=None, chunk_chars=None):
+        """Bulk-ingest texts: optionally chunk them, skip ones already stored, then embed and write to Chroma in batches"""
+        batch_size = batch_size or self.batch_size
+        chunk_chars = self.chunk_chars if chunk_chars is None else chunk_chars
+        entries = {}
+        for i, text in enumerate(texts):
+            base = metadatas[i] if metadatas else {}
+            chunks = chunk_text(text, chunk_chars) if chunk_chars else [text]
+            for n, chunk in enumerate(chunks):
+                meta = {**base, 'text': chunk}
+                if len(chunks) > 1:
+                    meta['chunk'] = n
+                entries.setdefault(knowledge_id(chunk), (chunk, meta))
+
+        items = list(entries.items())
+        added = 0
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            # Dedup before embedding so repeated answers cost neither encoder time nor index space
+            existing = set(self.collection.get(ids=[i for i, _ in batch], include=[])['ids'])
+            batch = [(i, entry) for i, entry in batch if i not in existing]
+            if not batch:
+                continue
+            embeddings = self.embed([chunk for _, (chunk, _) in batch], batch_size=batch_size)
+            self.collection.add(ids=[i for i, _ in batch], embeddings=embeddings,
+                                metadatas=[meta for _, (_, meta) in batch])
+            added += len(batch)
+        return added
+
+    def rebuild_knowledge(self, batch_size=None, reset=False):
+        """
+        Re-index every stored session response into the knowledge collection, in batches
+
+        Ids are content hashes, so entries already present are skipped and bulk-loaded
+        knowledge is kept. reset=True drops the collection first; anything that is not
+        in the session table (add_many imports, pruned history) is then lost.
+        """
+        batch_size = batch_size or self.batch_size
+        if reset:
+            logger.warning("Dropping the knowledge collection before re-indexing")
+            self.chroma.delete_collection(name='knowledge')
+            self.collection = self.chroma.get_or_create_collection(name='knowledge')
+        total = 0
+        for responses in self.store.iter_responses(batch_size):
+            total += self.add_many(responses, batch_size=batch_size)
+            logger.info(f"Re-indexed {total} knowledge entries")
+        return total
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Manage the knowledge store')
+    parser.add_argument('--rebuild-knowledge', action='store_true',
+                        help='Re-index the session table into the persistent knowledge store')
+    parser.add_argument('--reset', action='store_true',
+                        help='With --rebuild-knowledge, drop the collection first (loses entries not in the session table)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Number of responses embedded per batch')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open('config.json') as f:
+        mgr = MemoryManager(json.load(f))
+    if args.rebuild_knowledge:
+        count = mgr.rebuild_knowledge(batch_size=args.batch_size, reset=args.reset)
+        print(f"Re-indexed {count} new entries; knowledge store holds {mgr.collection.count()}")
+    else:
+        print(f"Knowledge store holds {mgr.collection.count()} entries")
@@ -0,0 +1,125 @@
+"""
+Background memory ingestion for Local AI Avatar
+Records the exchange immediately and runs the slow MemoryManager work on a bounded worker pool
+"""
+
+import atexit
+import queue
+import signal
+import sys
+import threading
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+def exit_on_sigterm():
+    """
+    Turn SIGTERM into a normal interpreter exit so atexit flush hooks run
+
+    The Electron shell stops the backend with SIGTERM, which by default kills
+    the process without running atexit handlers, dropping queued memories.
+    Must be called from the main thread.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+class MemoryIngestQueue:
+    """Bounded queue that applies memory updates off the request path"""
+
+    def __init__(self, memory_mgr, workers: int = 2, maxsize: int = 64, put_timeout: float = 5.0):
+        """
+        Initialize ingestion queue and start workers
+
+        Args:
+            memory_mgr: MemoryManager that performs the updates
+            workers: Number of worker threads
+            maxsize: Maximum number of pending items before producers block
+            put_timeout: Seconds a producer waits for space before running the work inline
+        """
+        self.memory_mgr = memory_mgr
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stopped = False
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._run, name=f'memory-ingest-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        atexit.register(self.shutdown)
+
+    def submit(self, query: str, response: str, session_id: str = 'default') -> bool:
+        """
+        Record an exchange and queue its knowledge and agent-memory updates
+
+        The session row is written on the caller's thread (a single WAL
+        commit), so the next request's context always includes this turn.
+        When the queue stays full for put_timeout seconds the remaining work
+        is done on the caller's thread too, so producers slow down instead of
+        dropping memories.
+
+        Args:
+            query: User query
+            response: Assistant response
+            session_id: Conversation the exchange belongs to
+
+        Returns:
+            True if queued, False if processed inline
+        """
+        try:
+            self.memory_mgr.add_to_session(query, response, session_id)
+        except Exception as e:
+            logger.error(f"Session write failed: {e}")
+        if self._stopped:
+            self._ingest(query, response)
+            return False
+        try:
+            self._queue.put((query, response), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            logger.warning("Memory ingest queue full, processing inline")
+            self._ingest(query, response)
+            return False
+
+    def pending(self) -> int:
+        """Number of items waiting to be ingested"""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every queued item has been ingested"""
+        self._queue.join()
+
+    def shutdown(self, timeout: Optional[float] = 30.0):
+        """
+        Drain the queue and stop the workers
+
+        Args:
+            timeout: Seconds to wait for each worker to exit
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self.flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        logger.info("Memory ingest queue shut down")
+
+    def _ingest(self, query: str, response: str):
+        """Apply the slow memory updates for one exchange (embedding and LLM extraction)"""
+        try:
+            self.memory_mgr.add_to_knowledge(response)
+            self.memory_mgr.update_agent_memory(query, response)
+        except Exception as e:
+            logger.error(f"Memory ingestion failed: {e}")
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._ingest(*item)
+            finally:
+                self._queue.task_done()
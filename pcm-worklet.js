@@ -0,0 +1,16 @@
+// Audio worklet: hands the microphone to the main thread as 16-bit PCM at the context's sample rate
+class PcmCapture extends AudioWorkletProcessor {
+  process(inputs) {
+    const channel = inputs[0][0];
+    if (channel) {
+      const pcm = new Int16Array(channel.length);
+      for (let i = 0; i < channel.length; i++) {
+        pcm[i] = Math.max(-1, Math.min(1, channel[i])) * 0x7fff;
+      }
+      this.port.postMessage(pcm, [pcm.buffer]);
+    }
+    return true;
+  }
+}
+
+registerProcessor('pcm-capture', PcmCapture);
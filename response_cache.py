@@ -0,0 +1,226 @@
+"""
+Semantic response cache for Local AI Avatar
+Reuses recent answers for repeated or paraphrased queries
+"""
+
+import re
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Agent tools (by name) and the category whose TTL their answers get
+TOOL_CATEGORIES = {
+    'Financial Data': 'finance',
+    'Calendar Manager': 'calendar',
+    'Email Manager': 'email',
+    'Web Research': 'web',
+    'File Organizer': 'files',
+    'Document Handler': 'files',
+}
+
+# Tools that change something (calendar entries, mail, files); their answers must never be replayed
+SIDE_EFFECT_TOOLS = {'Calendar Manager', 'Email Manager', 'File Organizer', 'Document Handler'}
+
+# Queries that ask for an action rather than information
+WRITE_QUERY_PATTERN = re.compile(
+    r'^\s*(?:(?:please|can you|could you|would you|will you|go ahead and|i want you to|i need you to)\s+)*'
+    r'(?:add|create|schedule|book|set|send|draft|write|reply|forward|email|delete|remove|cancel|move|'
+    r'rename|organi[sz]e|save|update|edit|change|make|put|invite|remind|copy|archive|mark|clear|sort)\b',
+    re.IGNORECASE)
+
+def is_write_query(query: str) -> bool:
+    """True for imperative requests (add, send, move, ...) whose effect a cached answer would skip"""
+    return bool(WRITE_QUERY_PATTERN.match(query))
+
+# Whole-word keywords, used when no tool call is known (e.g. the direct streaming path)
+CATEGORY_KEYWORDS = {
+    'finance': ('stock', 'stocks', 'share', 'shares', 'share price', 'ticker', 'market', 'markets', 'price',
+                'prices', 'trading', 'crypto', 'bitcoin', 'btc', 'ethereum', 'nasdaq', 'dow jones', 's&p',
+                'earnings', 'dividend', 'portfolio', 'exchange rate'),
+    'calendar': ('calendar', 'meeting', 'meetings', 'schedule', 'appointment', 'event', 'events',
+                 'today', 'tomorrow'),
+    'email': ('email', 'emails', 'e-mail', 'inbox', 'mail'),
+    'web': ('search', 'news', 'latest', 'weather', 'look up'),
+    'files': ('file', 'files', 'folder', 'folders', 'organize', 'document', 'documents', 'spreadsheet'),
+}
+CATEGORY_PATTERNS = {
+    category: re.compile(r'(?<![\w&])(?:' + '|'.join(re.escape(k) for k in keywords) + r')(?![\w&])')
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+# Upper-case words like AAPL or $TSLA read as tickers; common acronyms are not
+TICKER_PATTERN = re.compile(r'(?<![\w$])(?:\$[A-Za-z]{1,5}|[A-Z]{2,5})(?!\w)')
+NOT_TICKERS = {'AI', 'OK', 'AM', 'PM', 'US', 'USA', 'UK', 'EU', 'TV', 'ID', 'PDF', 'CSV', 'FAQ', 'ASAP',
+               'CEO', 'API', 'URL', 'HTML', 'JSON', 'FYI', 'ETA', 'TODO', 'THE', 'AND', 'WHAT', 'HOW'}
+
+DEFAULT_TTLS = {
+    'finance': 60,
+    'calendar': 300,
+    'email': 300,
+    'web': 1800,
+    'files': 300,
+    'default': 300,
+}
+
+def classify_query(query: str) -> str:
+    """
+    Map a query to a tool category for TTL purposes
+
+    Args:
+        query: User query
+
+    Returns:
+        Category name, or 'default'
+    """
+    if any(t.lstrip('$').upper() not in NOT_TICKERS for t in TICKER_PATTERN.findall(query)):
+        return 'finance'
+    lowered = query.lower()
+    for category, pattern in CATEGORY_PATTERNS.items():
+        if pattern.search(lowered):
+            return category
+    return 'default'
+
+class SemanticResponseCache:
+    """Matches queries by embedding similarity against recently answered ones"""
+
+    def __init__(self, memory_mgr, config: dict):
+        """
+        Initialize response cache
+
+        Args:
+            memory_mgr: MemoryManager whose embedder (and embedding cache) is reused
+            config: Application configuration
+        """
+        self.memory_mgr = memory_mgr
+        self._lock = threading.Lock()
+        self._queries: List[str] = []
+        self._responses: List[str] = []
+        self._categories: List[str] = []
+        self._expires: List[float] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_category: Dict[str, int] = {}
+        self.configure(config)
+
+    def configure(self, config: dict):
+        """Apply cache settings from the application config"""
+        self.enabled = config.get('semantic_cache_enabled', False)
+        self.threshold = config.get('semantic_cache_threshold', 0.92)
+        self.max_entries = config.get('semantic_cache_size', 512)
+        self.ttls = {**DEFAULT_TTLS, **config.get('semantic_cache_ttls', {})}
+        if not self.enabled:
+            self.clear()
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Unit-length embedding of a query"""
+        vector = np.asarray(self.memory_mgr.embed([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self, now: float):
+        """Drop expired entries (caller holds the lock)"""
+        keep = [i for i, expires in enumerate(self._expires) if expires > now]
+        if len(keep) != len(self._expires):
+            self._select(keep)
+
+    def _select(self, keep: List[int]):
+        """Keep only the given entry indices (caller holds the lock)"""
+        self._queries = [self._queries[i] for i in keep]
+        self._responses = [self._responses[i] for i in keep]
+        self._categories = [self._categories[i] for i in keep]
+        self._expires = [self._expires[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def get(self, query: str) -> Optional[str]:
+        """
+        Look up a cached answer
+
+        Args:
+            query: User query
+
+        Returns:
+            Cached response if a live entry is similar enough, else None
+        """
+        if not self.enabled or is_write_query(query):
+            return None  # Replaying "Event added" would skip the action itself
+        vector = self._embed(query)
+        with self._lock:
+            self._evict_expired(time.time())
+            if self._queries:
+                scores = self._vectors @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    category = self._categories[best]
+                    self.hits_by_category[category] = self.hits_by_category.get(category, 0) + 1
+                    logger.debug(f"Response cache hit ({scores[best]:.3f}) for: {query}")
+                    return self._responses[best]
+            self.misses += 1
+        return None
+
+    def classify(self, query: str, tools_used: Optional[List[str]] = None) -> str:
+        """
+        Category for an answer: the shortest-lived tool it used, else a guess from the query
+
+        Args:
+            query: User query
+            tools_used: Names of the agent tools called while answering, if known
+        """
+        categories = {TOOL_CATEGORIES[t] for t in tools_used or () if t in TOOL_CATEGORIES}
+        if categories:
+            return min(categories, key=lambda c: self.ttls.get(c, self.ttls['default']))
+        return classify_query(query)
+
+    def put(self, query: str, response: str, tools_used: Optional[List[str]] = None):
+        """
+        Remember an answer
+
+        Args:
+            query: User query
+            response: Assistant response
+            tools_used: Names of the agent tools called while answering, if known
+        """
+        if not self.enabled or not response or is_write_query(query):
+            return
+        if SIDE_EFFECT_TOOLS.intersection(tools_used or ()):
+            return
+        category = self.classify(query, tools_used)
+        ttl = self.ttls.get(category, self.ttls['default'])
+        if ttl <= 0:
+            return
+        vector = self._embed(query)
+        with self._lock:
+            now = time.time()
+            self._evict_expired(now)
+            if len(self._queries) >= self.max_entries:
+                # Oldest entries sit at the front
+                self._select(list(range(len(self._queries) - self.max_entries + 1, len(self._queries))))
+            self._queries.append(query)
+            self._responses.append(response)
+            self._categories.append(category)
+            self._expires.append(now + ttl)
+            self._vectors = np.vstack([self._vectors, vector]) if len(self._vectors) else vector[None, :]
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._select([])
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._queries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'hits_by_category': dict(self.hits_by_category)
+            }
@@ -0,0 +1,189 @@
+"""
+SQLite session store for Local AI Avatar
+WAL-mode session/agent tables on one shared connection, with optional batched commits and retention
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+import logging
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """Conversation history and agent memory backed by memory.db"""
+
+    def __init__(self, db_path: str = 'memory.db', max_history: int = 50, commit_batch: int = 1,
+                 flush_interval: float = 2.0):
+        """
+        Initialize session store and migrate the schema
+
+        Args:
+            db_path: SQLite database file
+            max_history: Exchanges kept per session; older ones are pruned (0 keeps everything)
+            commit_batch: Buffered writes that trigger a commit (1 commits every write)
+            flush_interval: With commit_batch > 1, seconds before a partial batch is committed anyway
+        """
+        self.db_path = db_path
+        self.max_history = max_history
+        self.commit_batch = commit_batch
+        # One connection for every thread. Flask runs each request on a new thread, so
+        # per-thread connections leaked a connection (and two fds) per request.
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.RLock()
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._migrate()
+        if commit_batch > 1 and flush_interval > 0:
+            # Cap how long an exchange can sit only in memory
+            threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                             name='session-flush', daemon=True).start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """The shared connection; callers hold _db_lock while using it"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn = conn
+        return self._conn
+
+    def _migrate(self):
+        """Create tables and bring pre-existing ones up to the current schema"""
+        with self._db_lock:
+            self._migrate_locked(self._connect())
+
+    def _migrate_locked(self, conn: sqlite3.Connection):
+        conn.execute('CREATE TABLE IF NOT EXISTS session (query TEXT, response TEXT)')
+        conn.execute('CREATE TABLE IF NOT EXISTS agent (key TEXT, value TEXT)')
+
+        session_cols = {row[1] for row in conn.execute('PRAGMA table_info(session)')}
+        if 'session_id' not in session_cols:
+            conn.execute("ALTER TABLE session ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default'")
+        if 'created_at' not in session_cols:
+            conn.execute('ALTER TABLE session ADD COLUMN created_at REAL NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_session_sid_created ON session(session_id, created_at)')
+
+        agent_cols = {row[1] for row in conn.execute('PRAGMA table_info(agent)')}
+        if 'updated_at' not in agent_cols:
+            conn.execute('ALTER TABLE agent ADD COLUMN updated_at REAL NOT NULL DEFAULT 0')
+        # Older builds had no key constraint, so INSERT OR REPLACE only ever appended
+        conn.execute('DELETE FROM agent WHERE rowid NOT IN (SELECT MAX(rowid) FROM agent GROUP BY key)')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_agent_key_unique ON agent(key)')
+        conn.commit()
+
+    def add(self, query: str, response: str, session_id: str = 'default'):
+        """
+        Buffer an exchange; it is committed with the next batch
+
+        Args:
+            query: User query
+            response: Assistant response
+            session_id: Conversation the exchange belongs to
+        """
+        with self._lock:
+            self._pending.append((query, response, session_id, time.time()))
+            should_flush = len(self._pending) >= self.commit_batch
+        if should_flush:
+            self.flush()
+
+    def _flush_loop(self, interval: float):
+        """Commit partial batches every interval seconds until closed"""
+        while not self._closed.wait(interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Periodic session flush failed: {e}")
+
+    def flush(self):
+        """Commit buffered exchanges in one transaction and apply retention"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany('INSERT INTO session (query, response, session_id, created_at) VALUES (?, ?, ?, ?)',
+                                 pending)
+            self.prune({row[2] for row in pending})
+
+    def prune(self, session_ids: Optional[set] = None):
+        """
+        Drop exchanges beyond max_history
+
+        Args:
+            session_ids: Sessions to prune (defaults to all)
+        """
+        if self.max_history <= 0:
+            return
+        with self._db_lock:
+            conn = self._connect()
+            if session_ids is None:
+                session_ids = {row[0] for row in conn.execute('SELECT DISTINCT session_id FROM session')}
+            with conn:
+                for session_id in session_ids:
+                    conn.execute('DELETE FROM session WHERE session_id = ? AND rowid NOT IN '
+                                 '(SELECT rowid FROM session WHERE session_id = ? '
+                                 'ORDER BY created_at DESC, rowid DESC LIMIT ?)',
+                                 (session_id, session_id, self.max_history))
+
+    def recent(self, limit: int = 5, session_id: str = 'default') -> List[Tuple[str, str]]:
+        """
+        Most recent exchanges, newest first
+
+        Args:
+            limit: Number of exchanges
+            session_id: Conversation to read
+
+        Returns:
+            List of (query, response)
+        """
+        self.flush()
+        with self._db_lock:
+            return self._connect().execute(
+                'SELECT query, response FROM session WHERE session_id = ? '
+                'ORDER BY created_at DESC, rowid DESC LIMIT ?', (session_id, limit)).fetchall()
+
+    def iter_responses(self, batch_size: int = 64) -> Iterator[List[str]]:
+        """
+        Yield stored responses in rowid order, one batch at a time
+
+        Args:
+            batch_size: Rows per batch
+        """
+        self.flush()
+        last_rowid = 0
+        while True:
+            with self._db_lock:  # Released between batches so requests are not blocked by a rebuild
+                rows = self._connect().execute(
+                    'SELECT rowid, response FROM session WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                    (last_rowid, batch_size)).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [r for _, r in rows if r]
+
+    def set_agent_value(self, key: str, value: str):
+        """Insert or update one agent memory entry"""
+        with self._db_lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO agent (key, value, updated_at) VALUES (?, ?, ?)',
+                             (key, value, time.time()))
+
+    def close(self):
+        """Flush buffered writes and close the connection"""
+        self._closed.set()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to flush session store: {e}")
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,100 @@
+"""
+Sentence-level speech pipeline for Local AI Avatar
+Splits streamed LLM output into sentences and synthesizes each one as soon as it is complete
+"""
+
+import re
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'([.!?]+["\')\]]*)\s+|\n+')
+ABBREVIATIONS = {'mr.', 'mrs.', 'ms.', 'dr.', 'prof.', 'sr.', 'jr.', 'st.', 'vs.', 'etc.', 'e.g.', 'i.e.', 'inc.', 'no.'}
+
+class SentenceSplitter:
+    """Accumulates streamed tokens and releases complete sentences"""
+
+    def __init__(self, min_chars: int = 12):
+        """
+        Initialize splitter
+
+        Args:
+            min_chars: Shorter fragments are merged into the next sentence
+        """
+        self.min_chars = min_chars
+        self._buffer = ''
+
+    def feed(self, token: str) -> List[str]:
+        """
+        Add a token
+
+        Args:
+            token: Next chunk of LLM output
+
+        Returns:
+            Sentences completed by this token
+        """
+        self._buffer += token
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            last_word = candidate.rsplit(None, 1)[-1].lower() if candidate else ''
+            if len(candidate) < self.min_chars or last_word in ABBREVIATIONS:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Release whatever is left once the stream ends"""
+        remainder, self._buffer = self._buffer.strip(), ''
+        return [remainder] if remainder else []
+
+class SpeechPipeline:
+    """Synthesizes sentences concurrently and hands the audio back in order"""
+
+    def __init__(self, synthesize: Callable[[str], bytes], workers: int = 1):
+        """
+        Initialize pipeline
+
+        Args:
+            synthesize: Function turning a sentence into WAV bytes
+            workers: Sentences synthesized at the same time
+        """
+        self.synthesize = synthesize
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speech')
+        self._pending: "deque[Tuple[int, str, Future]]" = deque()
+        self._next_index = 0
+
+    def submit(self, sentence: str):
+        """Queue a sentence for synthesis"""
+        future = self._executor.submit(self.synthesize, sentence)
+        self._pending.append((self._next_index, sentence, future))
+        self._next_index += 1
+
+    def ready(self) -> Iterator[Tuple[int, str, bytes]]:
+        """Yield finished segments from the head of the queue without blocking"""
+        while self._pending and self._pending[0][2].done():
+            index, sentence, future = self._pending.popleft()
+            yield index, sentence, future.result()
+
+    def drain(self) -> Iterator[Tuple[int, str, bytes]]:
+        """Yield every remaining segment in order, waiting as needed, then shut down"""
+        try:
+            while self._pending:
+                index, sentence, future = self._pending.popleft()
+                yield index, sentence, future.result()
+        finally:
+            self.close()
+
+    def close(self):
+        """Cancel outstanding work"""
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
@@ -1,14 +1,238 @@
+import io
 import os
 import wave
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import logging
+import numpy as np
 import pyaudio
 
-def transcribe_audio(audio_data):
-    with open('temp.wav', 'wb') as f:
-        f.write(audio_data)
-    # Assume Whisper.cpp binary in path
-    os.system('./whisper.cpp/main -m models/ggml-small.en.bin -f temp.wav --output-txt')
-    with open('temp.txt', 'r') as f:
-        text = f.read().strip()
-    os.remove('temp.wav')
-    os.remove('temp.txt')
-    return text
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # whisper.cpp expects 16 kHz mono
+
+MIN_DURATION = 0.1  # Seconds; anything shorter is not worth a decode
+SILENCE_PEAK = 1e-3
+
+# Container magic numbers, for uploads without a usable filename
+MAGIC_FORMATS = [
+    (b'RIFF', 'wav'),
+    (b'\x1aE\xdf\xa3', 'webm'),
+    (b'OggS', 'ogg'),
+    (b'ID3', 'mp3'),
+    (b'fLaC', 'flac'),
+]
+
+def sniff_format(audio_data, filename=None):
+    """Guess the container format from magic bytes, then the filename extension"""
+    for magic, fmt in MAGIC_FORMATS:
+        if audio_data.startswith(magic):
+            return fmt
+    if filename and '.' in filename:
+        return filename.rsplit('.', 1)[1].lower()
+    return None
+
+def resample(samples, rate):
+    """Linear resample of a mono float32 buffer to SAMPLE_RATE"""
+    if rate == SAMPLE_RATE or len(samples) == 0:
+        return samples
+    positions = np.linspace(0, len(samples) - 1, int(len(samples) * SAMPLE_RATE / rate))
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def wav_to_float32(audio_data):
+    """Decode 16-bit PCM WAV bytes to a 16 kHz mono float32 buffer, in memory"""
+    with wave.open(io.BytesIO(audio_data), 'rb') as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if width != 2:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate)
+
+def decode_audio(audio_data, filename=None):
+    """Decode a wav/webm/opus/ogg/mp3 upload to a 16 kHz mono float32 buffer without touching disk"""
+    if not audio_data:
+        raise ValueError("Empty audio upload")
+    fmt = sniff_format(audio_data, filename)
+    samples = None
+    if fmt == 'wav':
+        try:
+            samples = wav_to_float32(audio_data)
+        except (wave.Error, ValueError, EOFError):
+            pass  # Not 16-bit PCM; let ffmpeg handle it
+    if samples is None:
+        from pydub import AudioSegment  # Uses ffmpeg for compressed formats
+        segment = AudioSegment.from_file(io.BytesIO(audio_data), format=fmt)
+        segment = segment.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+        samples = np.frombuffer(segment.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+    if len(samples) < MIN_DURATION * SAMPLE_RATE:
+        raise ValueError(f"Audio too short: {len(samples) / SAMPLE_RATE:.2f}s")
+    return samples
+
+class STTEngine:
+    """Keeps the whisper.cpp model resident and serializes access to it"""
+
+    def __init__(self, model_path='models/ggml-small.en.bin', threads=4, binary='./whisper.cpp/main'):
+        self.model_path = model_path
+        self.threads = threads
+        self.binary = binary
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the model once; falls back to the whisper.cpp CLI if bindings are missing"""
+        with self._lock:
+            if self.model is None:
+                try:
+                    from pywhispercpp.model import Model
+                    self.model = Model(self.model_path, n_threads=self.threads, print_progress=False,
+                                       print_realtime=False)
+                    logger.info(f"Loaded whisper model {self.model_path}")
+                except ImportError:
+                    logger.warning("pywhispercpp not installed, using whisper.cpp CLI (model reloads per call)")
+                    self.model = False
+        return self
+
+    def transcribe(self, samples):
+        """Transcribe a 16 kHz mono float32 buffer"""
+        self.load()
+        if len(samples) == 0:
+            return ''
+        with self._lock:  # whisper contexts are not reentrant
+            if self.model:
+                segments = self.model.transcribe(samples)
+                return ' '.join(s.text.strip() for s in segments).strip()
+        return self._transcribe_cli(samples)
+
+    def _transcribe_cli(self, samples):
+        """Fallback: run the CLI on a private temp file so concurrent calls don't collide"""
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        with tempfile.TemporaryDirectory() as tmp:
+            wav_path = os.path.join(tmp, 'input.wav')
+            with wave.open(wav_path, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(pcm.tobytes())
+            subprocess.run([self.binary, '-m', self.model_path, '-t', str(self.threads), '-f', wav_path,
+                            '--output-txt', '-of', os.path.join(tmp, 'output')],
+                           check=True, capture_output=True)
+            with open(os.path.join(tmp, 'output.txt'), 'r') as f:
+                return f.read().strip()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine(config=None):
+    """Process-wide STT engine, created on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            config = config or {}
+            _engine = STTEngine(model_path=config.get('stt_model_path', 'models/ggml-small.en.bin'),
+                                threads=config.get('stt_threads', 4))
+    return _engine
+
+class StreamingTranscriber:
+    """Incremental transcription of a live PCM stream, split into utterances by an energy VAD"""
+
+    FRAME = 480  # 30 ms at 16 kHz
+
+    def __init__(self, engine, energy_threshold=0.01, silence_ms=600, partial_ms=1000, max_utterance_s=30):
+        self.engine = engine
+        self.energy_threshold = energy_threshold
+        self.silence_frames = silence_ms * SAMPLE_RATE // 1000 // self.FRAME
+        self.partial_samples = partial_ms * SAMPLE_RATE // 1000
+        self.max_samples = max_utterance_s * SAMPLE_RATE
+        self._pending = np.zeros(0, dtype=np.float32)  # Samples not yet split into frames
+        self._utterance = []
+        self._utterance_len = 0
+        self._silent = 0
+        self._since_partial = 0
+        self.finals = []
+        self.last_active = time.time()
+
+    def feed(self, pcm_bytes):
+        """Add 16 kHz mono int16 PCM; returns partial/final transcript events"""
+        self.last_active = time.time()
+        samples = np.frombuffer(pcm_bytes[:len(pcm_bytes) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+        self._pending = np.concatenate([self._pending, samples])
+        events = []
+        while len(self._pending) >= self.FRAME:
+            frame, self._pending = self._pending[:self.FRAME], self._pending[self.FRAME:]
+            speech = np.sqrt(np.mean(frame ** 2)) >= self.energy_threshold
+            if not self._utterance and not speech:
+                continue
+            self._utterance.append(frame)
+            self._utterance_len += self.FRAME
+            self._since_partial += self.FRAME
+            self._silent = 0 if speech else self._silent + 1
+            if self._silent >= self.silence_frames or self._utterance_len >= self.max_samples:
+                events.append(self._finalize())
+            elif self._since_partial >= self.partial_samples:
+                self._since_partial = 0
+                events.append({'type': 'partial', 'text': self.engine.transcribe(np.concatenate(self._utterance))})
+        return events
+
+    def finish(self):
+        """Flush the utterance in progress; returns remaining events"""
+        in_progress = bool(self._utterance)
+        if in_progress and self._pending.size:
+            self._utterance.append(self._pending)  # Sub-frame tail of the speech in progress
+        self._pending = np.zeros(0, dtype=np.float32)
+        return [self._finalize()] if in_progress else []
+
+    def _finalize(self):
+        text = self.engine.transcribe(np.concatenate(self._utterance))
+        self._utterance, self._utterance_len, self._silent, self._since_partial = [], 0, 0, 0
+        if text:
+            self.finals.append(text)
+        return {'type': 'final', 'text': text}
+
+    @property
+    def text(self):
+        return ' '.join(self.finals)
+
+_streams = {}
+_streams_lock = threading.Lock()
+STREAM_IDLE_TIMEOUT = 120
+
+def open_stream(config=None):
+    """Start a streaming transcription session; returns its id"""
+    config = config or {}
+    now = time.time()
+    with _streams_lock:
+        for stream_id in [k for k, v in _streams.items() if now - v.last_active > STREAM_IDLE_TIMEOUT]:
+            del _streams[stream_id]  # Abandoned by the client
+        stream_id = uuid.uuid4().hex
+        _streams[stream_id] = StreamingTranscriber(get_engine(config),
+                                                   energy_threshold=config.get('stt_vad_threshold', 0.01),
+                                                   silence_ms=config.get('stt_vad_silence_ms', 600),
+                                                   partial_ms=config.get('stt_partial_ms', 1000))
+    return stream_id
+
+def get_stream(stream_id):
+    with _streams_lock:
+        stream = _streams.get(stream_id)
+    if stream is None:
+        raise KeyError(f"Unknown transcription stream: {stream_id}")
+    return stream
+
+def close_stream(stream_id):
+    with _streams_lock:
+        stream = _streams.pop(stream_id, None)
+    if stream is None:
+        raise KeyError(f"Unknown transcription stream: {stream_id}")
+    return stream
+
+def transcribe_audio(audio_data, filename=None):
+    samples = decode_audio(audio_data, filename)
+    if np.max(np.abs(samples)) < SILENCE_PEAK:
+        return ''  # Nothing to decode
+    return get_engine().transcribe(samples)
+
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for the caching, memory and speech helpers
+These cover pure logic only, so no models, Ollama or camera are needed
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class OptimizationTester:
+    """Check the behaviour of the performance helpers"""
+
+    def __init__(self):
+        """Initialize the tester"""
+        self.tmp = Path(tempfile.mkdtemp(prefix='avatar-tests-'))
+        self.test_results = {}
+
+        # Setup logging
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+
+    def _check(self, results: Dict[str, bool], name: str, ok: bool) -> bool:
+        results[name] = bool(ok)
+        if ok:
+            logger.info(f"✓ {name}")
+        else:
+            logger.error(f"✗ {name}")
+        return bool(ok)
+
+    def test_session_store(self) -> bool:
+        """Retention, batching and connection handling of SessionStore"""
+        logger.info("Testing session store...")
+        from session_store import SessionStore
+
+        results = {}
+        store = SessionStore(str(self.tmp / 'retention.db'), max_history=3)
+        for i in range(5):
+            store.add(f'q{i}', f'r{i}', 'a')
+        store.add('other', 'r', 'b')
+        self._check(results, 'Retention keeps the newest max_history exchanges, newest first',
+                    store.recent(10, 'a') == [('q4', 'r4'), ('q3', 'r3'), ('q2', 'r2')])
+        self._check(results, 'Sessions are kept apart', store.recent(10, 'b') == [('other', 'r')])
+
+        store.set_agent_value('k', 'v1')
+        store.set_agent_value('k', 'v2')
+        rows = store._connect().execute('SELECT value FROM agent WHERE key = ?', ('k',)).fetchall()
+        self._check(results, 'Agent values are updated in place', rows == [('v2',)])
+        store.close()
+
+        batched = SessionStore(str(self.tmp / 'batched.db'), commit_batch=8, flush_interval=0)
+        batched.add('q', 'r')
+        self._check(results, 'Batched writes are visible to readers', batched.recent(5) == [('q', 'r')])
+        batched.close()
+
+        shared = SessionStore(str(self.tmp / 'threads.db'), max_history=5)
+        fds_before = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+
+        def request(i):
+            shared.add(f'q{i}', 'r')
+            shared.recent(5)
+
+        for i in range(100):
+            thread = threading.Thread(target=request, args=(i,))
+            thread.start()
+            thread.join()
+        if fds_before is not None:
+            self._check(results, 'Short-lived request threads do not leak connections',
+                        len(os.listdir('/proc/self/fd')) <= fds_before + 2)
+        self._check(results, 'Concurrent writers all land', len(shared.recent(10)) == 5)
+        shared.close()
+
+        self.test_results['session_store'] = results
+        return all(results.values())
+
+    def test_context_builder(self) -> bool:
+        """Token budget packing"""
+        logger.info("Testing context builder...")
+        from context_builder import ContextBuilder, count_tokens
+
+        results = {}
+        builder = ContextBuilder(budget=100, history_share=0.5, min_entry_tokens=8)
+        packed, used = builder._pack(['a' * 40, 'b' * 40, 'c' * 400], 30)
+        self._check(results, 'Entries are taken in priority order and the last one truncated',
+                    packed[:2] == ['a' * 40, 'b' * 40] and len(packed) == 3 and used <= 30)
+        packed, _ = builder._pack(['a' * 400], 4)
+        self._check(results, 'Fragments below min_entry_tokens are dropped', packed == [])
+
+        history = [(f'question {i}', 'x' * 200) for i in range(10)]
+        context = builder.build('query', history, ['y' * 200] * 10)
+        self._check(results, 'Built context stays within the budget', context['tokens'] <= 100)
+        self._check(results, 'Token counts are positive for text', count_tokens('hello world') > 0 and count_tokens('') == 0)
+
+        self.test_results['context_builder'] = results
+        return all(results.values())
+
+    def test_response_cache(self) -> bool:
+        """Query classification, TTL selection and write-query handling"""
+        logger.info("Testing response cache...")
+        from response_cache import SemanticResponseCache, classify_query, is_write_query
+
+        results = {}
+        self._check(results, 'Tickers classify as finance',
+                    classify_query('how is AAPL doing?') == 'finance' and classify_query('$tsla?') == 'finance')
+        self._check(results, 'Keywords match whole words only',
+                    classify_query('open the window') == 'default' and classify_query('download it') == 'default')
+        self._check(results, 'Common acronyms are not tickers', classify_query('What is AI?') == 'default')
+        self._check(results, 'Imperative queries are recognised',
+                    is_write_query('add a dentist appointment tomorrow at 3')
+                    and is_write_query('Please send an email to Bob')
+                    and not is_write_query('what is on my calendar'))
+
+        class Embedder:
+            def embed(self, texts):
+                return [[1.0, 0.0]]
+
+        cache = SemanticResponseCache(Embedder(), {'semantic_cache_enabled': True})
+        self._check(results, 'Tool categories pick the shortest TTL',
+                    cache.classify('hi', ['Web Research', 'Financial Data']) == 'finance')
+        cache.put('what is on my calendar', 'Local event added', ['Calendar Manager'])
+        self._check(results, 'Answers from side-effecting tools are not cached', cache.stats()['entries'] == 0)
+        cache.put('what is the capital of France', 'Paris', [])
+        self._check(results, 'Read-only answers are served', cache.get('what is the capital of France') == 'Paris')
+        self._check(results, 'Write queries are never served from cache', cache.get('add Paris to my notes') is None)
+
+        self.test_results['response_cache'] = results
+        return all(results.values())
+
+    def test_sentence_splitter(self) -> bool:
+        """Streaming sentence segmentation"""
+        logger.info("Testing sentence splitter...")
+        from speech_pipeline import SentenceSplitter
+
+        results = {}
+        splitter = SentenceSplitter()
+        sentences = []
+        for token in ['Hello there, ', 'Dr. Smith is ', 'here today. ', 'Ok. ', 'The next one', ' follows!', ' Tail']:
+            sentences += splitter.feed(token)
+        sentences += splitter.flush()
+        self._check(results, 'Abbreviations and short fragments do not end a sentence',
+                    sentences == ['Hello there, Dr. Smith is here today.', 'Ok. The next one follows!', 'Tail'])
+
+        self.test_results['sentence_splitter'] = results
+        return all(results.values())
+
+    def test_tts_cache(self) -> bool:
+        """Byte-bounded LRU eviction of rendered phrases"""
+        logger.info("Testing TTS cache...")
+        from tts_cache import TTSCache
+
+        results = {}
+        cache = TTSCache(str(self.tmp / 'tts'), max_bytes=250, voice='v', rate=150)
+        cache.put('one', b'1' * 100)
+        cache.put('two', b'2' * 100)
+        cache.get('one')  # Now the most recently used
+        cache.put('three', b'3' * 100)
+        self._check(results, 'Least recently used phrase is evicted',
+                    cache.get('two') is None and cache.get('one') == b'1' * 100)
+        self._check(results, 'Total size stays within budget', cache.stats()['bytes'] <= 250)
+        self._check(results, 'Whitespace differences share an entry', cache.key('a  b') == cache.key('a b'))
+        reopened = TTSCache(str(self.tmp / 'tts'), max_bytes=250, voice='v', rate=150)
+        self._check(results, 'Index survives a restart', reopened.get('three') == b'3' * 100)
+
+        self.test_results['tts_cache'] = results
+        return all(results.values())
+
+    def test_image_cache(self) -> bool:
+        """Exact and near-duplicate matching rules"""
+        logger.info("Testing image cache...")
+        import cv2
+        from image_cache import ImageResultCache
+
+        results = {}
+        rng = np.random.default_rng(0)
+        textured = cv2.resize(rng.integers(0, 255, (16, 16, 3), dtype=np.uint8), (128, 128))
+        recompressed = cv2.imdecode(cv2.imencode('.jpg', textured, [cv2.IMWRITE_JPEG_QUALITY, 70])[1],
+                                    cv2.IMREAD_COLOR)
+
+        exact = ImageResultCache()
+        fp = exact.fingerprint(b'image-bytes', textured)
+        exact.put('analyze', fp, {'faces': 1})
+        self._check(results, 'Identical bytes hit', exact.get('analyze', fp) == {'faces': 1})
+        self._check(results, 'Perceptual matching is off by default',
+                    exact.get('analyze', exact.fingerprint(b'other', recompressed)) is None)
+        self._check(results, 'Namespaces are separate', exact.get('landmarks', fp) is None)
+
+        near = ImageResultCache(use_phash=True)
+        near.put('analyze', near.fingerprint(b'original', textured), {'faces': 1})
+        self._check(results, 'Re-encoded copy matches when enabled',
+                    near.get('analyze', near.fingerprint(b'copy', recompressed)) == {'faces': 1})
+        black = np.zeros((64, 64, 3), dtype=np.uint8)
+        near.put('analyze', near.fingerprint(b'black', black), {'faces': 0})
+        self._check(results, 'Flat images are never near-matched',
+                    near.get('analyze', near.fingerprint(b'white', black + 255)) is None)
+        near.put('landmarks', near.fingerprint(b'none', textured), None)
+        self._check(results, 'None results are not stored', near.stats()['entries'] == 2)
+
+        self.test_results['image_cache'] = results
+        return all(results.values())
+
+    def test_knowledge_chunking(self) -> bool:
+        """chunk_text and content-addressed dedup in add_many"""
+        logger.info("Testing knowledge chunking and dedup...")
+        from memory import MemoryManager, chunk_text, knowledge_id
+
+        results = {}
+        text = ' '.join(f'word{i}' for i in range(100))
+        chunks = chunk_text(text, 50)
+        self._check(results, 'Chunks respect the size limit', all(len(c) <= 50 for c in chunks))
+        self._check(results, 'Chunks break on whitespace and keep every word',
+                    ' '.join(chunks).split() == text.split())
+        self._check(results, 'Short text is a single chunk', chunk_text('  short  ', 50) == ['short'])
+        self._check(results, 'Ids ignore case and whitespace', knowledge_id('Hello  World') == knowledge_id('hello world'))
+
+        class Collection:
+            def __init__(self):
+                self.ids = {}
+
+            def get(self, ids, include):
+                return {'ids': [i for i in ids if i in self.ids]}
+
+            def add(self, ids, embeddings, metadatas):
+                self.ids.update(zip(ids, metadatas))
+
+        mgr = MemoryManager.__new__(MemoryManager)  # Skip model loading; add_many needs only these
+        mgr.collection = Collection()
+        mgr.batch_size = 2
+        mgr.chunk_chars = 0
+        encoded = []
+        mgr.embed = lambda texts, batch_size=None: encoded.extend(texts) or [[0.0]] * len(texts)
+        added = mgr.add_many(['Alpha', 'alpha ', 'Beta', 'Gamma'])
+        added += mgr.add_many(['Beta', 'Delta'])
+        self._check(results, 'Duplicates are skipped before embedding',
+                    added == 4 and sorted(encoded) == ['Alpha', 'Beta', 'Delta', 'Gamma'])
+
+        self.test_results['knowledge_chunking'] = results
+        return all(results.values())
+
+    def test_viseme_timeline(self) -> bool:
+        """Viseme track shape and timing"""
+        logger.info("Testing viseme timeline...")
+        from visemes import VISEMES, viseme_timeline
+
+        results = {}
+        timeline = viseme_timeline('Hello, how are you?', 2.0)
+        self._check(results, 'Only known visemes are produced', all(v['viseme'] in VISEMES for v in timeline))
+        self._check(results, 'Timeline covers the whole clip',
+                    timeline[0]['start'] == 0.0 and timeline[-1]['end'] == 2.0)
+        self._check(results, 'Segments are contiguous and non-empty',
+                    all(a['end'] == b['start'] for a, b in zip(timeline, timeline[1:]))
+                    and all(v['end'] > v['start'] for v in timeline))
+        self._check(results, 'Neighbouring segments differ',
+                    all(a['viseme'] != b['viseme'] for a, b in zip(timeline, timeline[1:])))
+        self._check(results, 'Empty text is a single rest segment',
+                    viseme_timeline('', 1.0) == [{'viseme': 'X', 'start': 0.0, 'end': 1.0}])
+
+        self.test_results['viseme_timeline'] = results
+        return all(results.values())
+
+    def run_all_tests(self) -> Dict[str, bool]:
+        """Run all tests"""
+        logger.info("Starting optimization behaviour tests...")
+
+        tests = [
+            ('Session Store', self.test_session_store),
+            ('Context Builder', self.test_context_builder),
+            ('Response Cache', self.test_response_cache),
+            ('Sentence Splitter', self.test_sentence_splitter),
+            ('TTS Cache', self.test_tts_cache),
+            ('Image Cache', self.test_image_cache),
+            ('Knowledge Chunking', self.test_knowledge_chunking),
+            ('Viseme Timeline', self.test_viseme_timeline)
+        ]
+
+        results = {}
+        for test_name, test_func in tests:
+            print(f"\n{'='*60}")
+            print(f"Testing: {test_name}")
+            print('='*60)
+
+            try:
+                results[test_name] = test_func()
+            except Exception as e:
+                logger.error(f"Test {test_name} failed with exception: {e}")
+                results[test_name] = False
+
+        return results
+
+    def print_summary(self, results: Dict[str, bool]):
+        """Print test summary"""
+        print(f"\n{'='*60}")
+        print("TEST SUMMARY")
+        print('='*60)
+
+        passed = sum(results.values())
+        total = len(results)
+
+        for test_name, passed_test in results.items():
+            icon = "✅" if passed_test else "❌"
+            print(f"{icon} {test_name}")
+
+        print(f"\n{passed}/{total} tests passed")
+
+        return passed == total
+
+def main():
+    """Main function"""
+    tester = OptimizationTester()
+    results = tester.run_all_tests()
+    success = tester.print_summary(results)
+
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    main()
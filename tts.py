@@ -1,34 +1,164 @@
-import pyttsx3
+import os
+import struct
+import tempfile
+import threading
+import logging
+from tts_cache import TTSCache
 
-# Initialize the text-to-speech engine
-engine = pyttsx3.init()
+logger = logging.getLogger(__name__)
 
-# Set the voice to Samantha (female, futuristic)
-voices = engine.getProperty('voices')
-for voice in voices:
-    if 'Samantha' in voice.name:
-        engine.setProperty('voice', voice.id)
-        break
+def wav_header(sample_rate, data_size=None, channels=1, sample_width=2):
+    """
+    Build a PCM WAV header.
+
+    With data_size=None the RIFF/data sizes are set to 0xFFFFFFFF, the usual
+    convention for a stream whose length is not known yet.
+    """
+    riff_size = 0xFFFFFFFF if data_size is None else 36 + data_size
+    data_size = 0xFFFFFFFF if data_size is None else data_size
+    byte_rate = sample_rate * channels * sample_width
+    return (b'RIFF' + struct.pack('<I', riff_size) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, byte_rate,
+                                    channels * sample_width, sample_width * 8)
+            + b'data' + struct.pack('<I', data_size))
+
+class PiperEngine:
+    """Piper neural TTS rendering straight to PCM buffers"""
+
+    def __init__(self, model_path):
+        from piper.voice import PiperVoice
+        self.voice = PiperVoice.load(model_path)
+        self.voice_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.sample_rate = self.voice.config.sample_rate
+        self._lock = threading.Lock()
+
+    def stream_pcm(self, text):
+        """Yield 16-bit mono PCM, one sentence at a time as Piper finishes it"""
+        with self._lock:
+            for audio_bytes in self.voice.synthesize_stream_raw(text):
+                yield audio_bytes
+
+class Pyttsx3Engine:
+    """System voice (Samantha on macOS) rendered to a file and read back into memory"""
+
+    sample_rate = 22050
+
+    def __init__(self, voice_name='Samantha', rate=150, volume=1.0):
+        import pyttsx3
+        self.voice_name = voice_name
+        self.engine = pyttsx3.init()
+        # Set the voice to Samantha (female, futuristic)
+        for voice in self.engine.getProperty('voices'):
+            if voice_name in voice.name:
+                self.engine.setProperty('voice', voice.id)
+                break
+        self.engine.setProperty('rate', rate)  # Speed of speech (words per minute)
+        self.engine.setProperty('volume', volume)  # Volume (0.0 to 1.0)
+        self._lock = threading.Lock()  # runAndWait is not reentrant
+
+    def stream_pcm(self, text):
+        from pydub import AudioSegment  # macOS writes AIFF whatever the extension
+        with self._lock, tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'speech.aiff')
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+            segment = AudioSegment.from_file(path)
+        segment = segment.set_channels(1).set_frame_rate(self.sample_rate).set_sample_width(2)
+        yield segment.raw_data
+
+def create_engine(config=None):
+    """Piper with the configured voice if available, otherwise pyttsx3"""
+    config = config or {}
+    model_path = os.path.join('models', f"{config.get('tts_voice', 'en_US-amy-medium')}.onnx")
+    if os.path.exists(model_path):
+        try:
+            engine = PiperEngine(model_path)
+            logger.info(f"Using Piper voice {model_path}")
+            return engine
+        except ImportError:
+            logger.warning("piper-tts not installed, falling back to pyttsx3")
+    return Pyttsx3Engine(rate=config.get('tts_rate', 150))
 
-# Optional: Adjust speech rate and volume
-engine.setProperty('rate', 150)  # Speed of speech (words per minute)
-engine.setProperty('volume', 1.0)  # Volume (0.0 to 1.0)
+_engine = None
+_cache = None
+_engine_lock = threading.Lock()
+
+def get_engine(config=None):
+    """Process-wide TTS engine (a worker pool when tts_workers > 0), created on first use"""
+    global _engine
+    config = config or {}
+    with _engine_lock:
+        if _engine is None:
+            if config.get('tts_workers', 0) > 0:
+                from tts_pool import TTSWorkerPool
+                pool = None
+                try:
+                    pool = TTSWorkerPool(config, workers=config['tts_workers'],
+                                         timeout=config.get('tts_timeout', 30))
+                    pool.check()  # Exercise a worker end to end before relying on the pool
+                    _engine = pool
+                except Exception as e:
+                    logger.error(f"TTS worker pool failed its startup check, synthesizing in-process: {e}")
+                    if pool is not None:
+                        pool.shutdown()
+            if _engine is None:
+                _engine = create_engine(config)
+    return _engine
+
+def get_cache(config=None):
+    """Process-wide phrase cache for the active voice, or None when disabled"""
+    global _cache
+    config = config or {}
+    engine = get_engine(config)
+    with _engine_lock:
+        if _cache is None and config.get('tts_cache_enabled', True):
+            _cache = TTSCache(config.get('tts_cache_dir', 'tts_cache'),
+                              max_bytes=config.get('tts_cache_max_mb', 256) * 1024 * 1024,
+                              voice=engine.voice_name, rate=config.get('tts_rate', 150))
+    return _cache
+
+def stream_speech(text):
+    """
+    Yield a streaming WAV: header first, then PCM chunks as they are synthesized.
+
+    Args:
+        text (str): The text to be spoken.
+    """
+    cached = _cache.get(text) if _cache else None
+    if cached is not None:
+        yield cached
+        return
+    engine = get_engine()
+    yield wav_header(engine.sample_rate)
+    chunks = []
+    for chunk in engine.stream_pcm(text):
+        chunks.append(chunk)
+        yield chunk
+    if _cache:
+        pcm = b''.join(chunks)
+        _cache.put(text, wav_header(engine.sample_rate, len(pcm)) + pcm)
 
 def text_to_speech(text):
     """
-    Converts the given text to speech and plays it.
-    
+    Converts the given text to speech.
+
     Args:
         text (str): The text to be spoken.
+
+    Returns:
+        bytes: Complete WAV file contents.
     """
-    engine.say(text)
-    engine.runAndWait()
+    cached = _cache.get(text) if _cache else None
+    if cached is not None:
+        return cached
+    engine = get_engine()
+    pcm = b''.join(engine.stream_pcm(text))
+    wav = wav_header(engine.sample_rate, len(pcm)) + pcm
+    if _cache:
+        _cache.put(text, wav)
+    return wav
 
 # Example usage
 if __name__ == "__main__":
-    text_to_speech("Hello, this is a test of the text-to-speech functionality.")
-
-# Optional: To save the speech to a file instead of playing it
-# def save_to_file(text, filename='output.mp3'):
-#     engine.save_to_file(text, filename)
-#     engine.runAndWait()
\ No newline at end of file
+    with open('output.wav', 'wb') as f:
+        f.write(text_to_speech("Hello, this is a test of the text-to-speech functionality."))
@@ -0,0 +1,152 @@
+"""
+TTS phrase cache for Local AI Avatar
+Byte-size bounded LRU of synthesized WAV files, keyed by voice, rate and text
+"""
+
+import hashlib
+import os
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+def normalize_phrase(text: str) -> str:
+    """Collapse whitespace; case and punctuation are kept since they change prosody"""
+    return ' '.join(text.split())
+
+class TTSCache:
+    """On-disk LRU of rendered phrases"""
+
+    def __init__(self, directory: str = 'tts_cache', max_bytes: int = 256 * 1024 * 1024,
+                 voice: str = '', rate: int = 0):
+        """
+        Initialize cache, indexing any files left from earlier runs
+
+        Args:
+            directory: Cache directory
+            max_bytes: Total size budget; least recently used files are evicted beyond it
+            voice: Voice name, part of every key
+            rate: Speech rate, part of every key
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+
+        files = sorted(self.directory.glob('*.wav'), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._index[path.stem] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def key(self, text: str) -> str:
+        """Cache key for a phrase under the current voice and rate"""
+        raw = f'{self.voice}\0{self.rate}\0{normalize_phrase(text)}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.wav'
+
+    def get(self, text: str) -> Optional[bytes]:
+        """
+        Cached WAV bytes for a phrase
+
+        Args:
+            text: Phrase to look up
+
+        Returns:
+            WAV bytes, or None on a miss
+        """
+        k = self.key(text)
+        with self._lock:
+            if k not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(k)
+        try:
+            data = self._path(k).read_bytes()
+            os.utime(self._path(k))  # Keeps LRU order across restarts
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(k, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, text: str, wav: bytes):
+        """
+        Store a rendered phrase
+
+        Args:
+            text: Phrase that was synthesized
+            wav: Complete WAV bytes
+        """
+        if len(wav) > self.max_bytes:
+            return
+        k = self.key(text)
+        path = self._path(k)
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_bytes(wav)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += len(wav) - self._index.pop(k, 0)
+            self._index[k] = len(wav)
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until under budget (caller holds the lock)"""
+        while self._total > self.max_bytes and self._index:
+            k, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                self._path(k).unlink()
+            except OSError as e:
+                logger.warning(f"Could not evict TTS cache entry {k}: {e}")
+
+    def prewarm(self, phrases: Iterable[str], synthesize: Callable[[str], bytes]) -> int:
+        """
+        Render phrases that are not cached yet
+
+        Args:
+            phrases: Phrases to have ready
+            synthesize: Function turning text into WAV bytes
+
+        Returns:
+            Number of phrases synthesized
+        """
+        rendered = 0
+        for phrase in phrases:
+            if self.key(phrase) in self._index:
+                continue
+            try:
+                self.put(phrase, synthesize(phrase))
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-warm phrase '{phrase}': {e}")
+        logger.info(f"Pre-warmed {rendered} TTS phrases")
+        return rendered
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and disk usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'bytes': self._total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
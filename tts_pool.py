@@ -0,0 +1,205 @@
+"""
+TTS worker pool for Local AI Avatar
+Runs one synthesis engine per worker process so throughput scales with cores
+"""
+
+import atexit
+import multiprocessing
+import queue
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+def _worker_main(conn, config: dict):
+    """Worker process: build an engine, report its voice, then serve requests until told to stop"""
+    from tts import create_engine
+    try:
+        engine = create_engine(config)
+    except Exception as e:
+        conn.send(('error', f'Engine failed to start: {e}'))
+        return
+    conn.send(('ready', engine.voice_name, engine.sample_rate))
+    while True:
+        try:
+            text = conn.recv()
+        except EOFError:
+            return
+        if text is None:
+            return
+        try:
+            conn.send(('ok', b''.join(engine.stream_pcm(text))))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+class _Worker:
+    """One engine process and the pipe to it"""
+
+    def __init__(self, ctx, config: dict, start_timeout: float):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, config), daemon=True)
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise TimeoutError("TTS worker did not start in time")
+        try:
+            message = self.conn.recv()
+        except EOFError:
+            # Typically the child failed while importing the parent's main module
+            self.kill()
+            raise RuntimeError(f"TTS worker exited during startup (exit code {self.process.exitcode})")
+        if message[0] != 'ready':
+            self.kill()
+            raise RuntimeError(message[1])
+        _, self.voice_name, self.sample_rate = message
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(5)
+        self.conn.close()
+
+class TTSWorkerPool:
+    """Fixed set of TTS worker processes behind a request queue"""
+
+    def __init__(self, config: dict, workers: int = 2, timeout: float = 30.0, start_timeout: float = 60.0):
+        """
+        Start worker processes
+
+        Args:
+            config: Application configuration, passed to each worker's engine
+            workers: Number of engine processes
+            timeout: Seconds allowed per synthesis request (including the wait for a free worker)
+            start_timeout: Seconds allowed for a worker to load its engine
+        """
+        self.config = config
+        self.size = workers
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.restarts = 0
+        self.completed = 0
+        self.failed = 0
+        self._ctx = multiprocessing.get_context('spawn')  # Engines are not fork-safe
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        try:
+            for _ in range(workers):
+                self._idle.put(_Worker(self._ctx, config, start_timeout))
+        except Exception:
+            self._stop_idle()
+            raise
+        first = self._idle.queue[0]
+        self.voice_name = first.voice_name
+        self.sample_rate = first.sample_rate
+        self._splitter_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts-pool')
+        atexit.register(self.shutdown)
+        logger.info(f"Started {workers} TTS workers ({self.voice_name})")
+
+    def _restart(self, worker: Optional[_Worker]) -> _Worker:
+        """Replace a dead or hung worker"""
+        if worker is not None:
+            worker.kill()
+        with self._stats_lock:
+            self.restarts += 1
+        logger.warning("Restarting TTS worker")
+        return _Worker(self._ctx, self.config, self.start_timeout)
+
+    def render(self, text: str, timeout: Optional[float] = None) -> bytes:
+        """
+        Synthesize text to 16-bit mono PCM on the next free worker
+
+        Args:
+            text: Text to speak
+            timeout: Override for the per-request timeout
+
+        Returns:
+            PCM bytes at self.sample_rate
+
+        Raises:
+            TimeoutError: No worker became free, or synthesis took too long
+            RuntimeError: The engine reported an error
+        """
+        timeout = timeout or self.timeout
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("All TTS workers busy")
+
+        try:
+            if not worker.alive():
+                worker = self._restart(worker)
+            try:
+                worker.conn.send(text)
+                if not worker.conn.poll(timeout):
+                    worker = self._restart(worker)
+                    raise TimeoutError(f"TTS synthesis exceeded {timeout}s")
+                status, payload = worker.conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                worker = self._restart(worker)
+                raise RuntimeError("TTS worker crashed")
+        except Exception:
+            with self._stats_lock:
+                self.failed += 1
+            raise
+        finally:
+            self._idle.put(worker)
+
+        if status != 'ok':
+            with self._stats_lock:
+                self.failed += 1
+            raise RuntimeError(payload)
+        with self._stats_lock:
+            self.completed += 1
+        return payload
+
+    def stream_pcm(self, text: str) -> Iterator[bytes]:
+        """Render sentences on parallel workers and yield their PCM in order"""
+        from speech_pipeline import SentenceSplitter
+        splitter = SentenceSplitter()
+        sentences = splitter.feed(text) + splitter.flush()
+        for pcm in self._splitter_pool.map(self.render, sentences):
+            yield pcm
+
+    def stats(self) -> Dict[str, int]:
+        """Worker and request counters"""
+        with self._stats_lock:
+            return {
+                'workers': self.size,
+                'idle': self._idle.qsize(),
+                'completed': self.completed,
+                'failed': self.failed,
+                'restarts': self.restarts
+            }
+
+    def check(self, text: str = 'Ready.'):
+        """
+        Synthesize a short phrase end to end on a worker
+
+        Raises:
+            TimeoutError, RuntimeError: The pool cannot serve requests
+        """
+        if not self.render(text, timeout=self.start_timeout):
+            raise RuntimeError("TTS worker returned no audio")
+
+    def shutdown(self):
+        """Stop every worker process"""
+        self._splitter_pool.shutdown(wait=False)
+        self._stop_idle()
+
+    def _stop_idle(self):
+        """Stop every worker currently in the idle queue"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            worker.kill()
@@ -1,4 +1,3 @@
-const axios = require('axios');
 const { initAvatar } = require('./avatar');
 const startLipSync = require('./lipsync');
 
@@ -10,20 +9,97 @@ document.addEventListener('DOMContentLoaded', () => {
   const status = document.getElementById('status');
   const micBtn = document.getElementById('mic-btn');
 
+  let listening = null;
   micBtn.addEventListener('click', () => {
-    navigator.mediaDevices.getUserMedia({ audio: true }).then(stream => {
-      const recorder = new MediaRecorder(stream);
-      recorder.start();
-      status.textContent = 'Listening...';
-      recorder.ondataavailable = e => {
-        const formData = new FormData();
-        formData.append('audio', e.data, 'audio.webm');
-        axios.post('http://localhost:5000/transcribe', formData).then(res => processQuery(res.data.text));
-      };
-      setTimeout(() => recorder.stop(), 5000);
+    if (listening) {
+      listening.stop();  // Second click ends the utterance early
+      return;
+    }
+    status.textContent = 'Listening...';
+    listening = listen(text => {
+      listening = null;
+      if (text) processQuery(text);
+      else status.textContent = 'Ready';
+    }, error => {
+      listening = null;
+      status.textContent = `Error: ${error}`;
     });
   });
 
+  // Stream 16 kHz PCM to /transcribe_stream and stop as soon as the server reports a final transcript
+  function listen(onText, onError, maxSeconds = 30) {
+    const url = 'http://localhost:5000/transcribe_stream';
+    const post = (path, body) => fetch(url + path, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/octet-stream' },
+      body
+    }).then(res => res.json());
+
+    let chunks = [];
+    const take = () => {
+      const pcm = new Int16Array(chunks.reduce((n, c) => n + c.length, 0));
+      let offset = 0;
+      for (const chunk of chunks) { pcm.set(chunk, offset); offset += chunk.length; }
+      chunks = [];
+      return pcm;
+    };
+
+    let streamId, mic, context, timer, limit;
+    let stopped = false;
+    let sending = Promise.resolve();
+    const stop = () => {
+      if (stopped) return;
+      stopped = true;
+      clearInterval(timer);
+      clearTimeout(limit);
+      if (mic) mic.getTracks().forEach(track => track.stop());
+      if (context) context.close();
+      if (!streamId) return onText('');
+      sending = sending
+        .then(() => post(`/${streamId}/end`, take()))
+        .then(res => (res.error ? onError(res.error) : onText(res.text)))
+        .catch(err => onError(err.message));
+    };
+    const handle = res => {
+      if (res.error) throw new Error(res.error);
+      for (const event of res.events) {
+        if (event.type === 'partial') status.textContent = `Listening... ${event.text}`;
+        if (event.type === 'final' && event.text) stop();
+      }
+    };
+
+    post('', null)
+      .then(res => {
+        streamId = res.stream_id;
+        return navigator.mediaDevices.getUserMedia({ audio: { channelCount: 1 } });
+      })
+      .then(stream => {
+        mic = stream;
+        context = new AudioContext({ sampleRate: 16000 });  // The browser resamples the mic for us
+        return context.audioWorklet.addModule('pcm-worklet.js');
+      })
+      .then(() => {
+        if (stopped) return;
+        const node = new AudioWorkletNode(context, 'pcm-capture');
+        node.port.onmessage = e => chunks.push(e.data);
+        context.createMediaStreamSource(mic).connect(node);
+        node.connect(context.destination);  // Keeps the node pulled; it outputs silence
+        timer = setInterval(() => {
+          if (!chunks.length || stopped) return;
+          const pcm = take();
+          sending = sending.then(() => post(`/${streamId}`, pcm)).then(handle).catch(stop);  // The /end call reports the error
+        }, 250);
+        limit = setTimeout(stop, maxSeconds * 1000);
+      })
+      .catch(err => {
+        stopped = true;
+        if (mic) mic.getTracks().forEach(track => track.stop());
+        onError(err.message);
+      });
+
+    return { stop };
+  }
+
   input.addEventListener('keydown', e => {
     if (e.key === 'Enter') processQuery(input.value);
   });
@@ -31,12 +107,54 @@ document.addEventListener('DOMContentLoaded', () => {
   function processQuery(query) {
     chat.innerHTML += `<p>User: ${query}</p>`;
     status.textContent = 'Thinking...';
-    axios.post('http://localhost:5000/generate_response', { query }).then(res => {
-      chat.innerHTML += `<p>AI: ${res.data.response}</p>`;
-      status.textContent = 'Responding...';
-      axios.post('http://localhost:5000/tts', { text: res.data.response }).then(ttsRes => {
-        startLipSync(ttsRes.data.audio_path);
-      });
+    const reply = document.createElement('p');
+    reply.textContent = 'AI: ';
+    chat.appendChild(reply);
+
+    // Render tokens as they arrive; speech arrives sentence by sentence, in order
+    const speech = [];
+    let speaking = false;
+    function playNext() {
+      if (speaking || speech.length === 0) return;
+      speaking = true;
+      const segment = speech.shift();
+      const audio = startLipSync(`data:audio/wav;base64,${segment.audio}`, segment.visemes);
+      audio.addEventListener('ended', () => { speaking = false; playNext(); });
+    }
+
+    streamResponse(query, {
+      status: data => { if (data.stage === 'tools') status.textContent = 'Using tools...'; },
+      token: data => { reply.textContent += data.token; },
+      audio: data => {
+        status.textContent = 'Responding...';
+        speech.push(data);
+        playNext();
+      },
+      done: () => { status.textContent = 'Ready'; },
+      error: data => { status.textContent = `Error: ${data.error}`; }
+    });
+  }
+
+  async function streamResponse(query, handlers) {
+    const res = await fetch('http://localhost:5000/generate_response_stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query, speak: true, tools: true })
     });
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+      for (const message of messages) {
+        const event = message.match(/^event: (.*)$/m);
+        const data = message.match(/^data: (.*)$/m);
+        if (event && data && handlers[event[1]]) handlers[event[1]](JSON.parse(data[1]));
+      }
+    }
   }
 });
\ No newline at end of file
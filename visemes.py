@@ -0,0 +1,117 @@
+"""
+Viseme timeline generation for Local AI Avatar
+Maps phonemes to mouth shapes and spreads them over the synthesized audio
+"""
+
+import io
+import wave
+from typing import Dict, List
+
+# Mouth shapes shared by the avatar renderer and the lip warp:
+#   X rest/closed, A open (ah/eye), E wide (ee/eh), O round (oh), U puckered (oo/w),
+#   M lips pressed (m/b/p), F lip on teeth (f/v), L tongue up (l/th/d/t/n), S teeth (s/z/ch/k/g/r/...)
+VISEMES = ('X', 'A', 'E', 'O', 'U', 'M', 'F', 'L', 'S')
+
+# IPA symbols as produced by espeak-ng (Piper's phonemizer)
+IPA_TO_VISEME = {
+    'a': 'A', 'ɑ': 'A', 'æ': 'A', 'ʌ': 'A', 'ɐ': 'A', 'aɪ': 'A', 'aʊ': 'A',
+    'e': 'E', 'ɛ': 'E', 'i': 'E', 'ɪ': 'E', 'eɪ': 'E', 'ə': 'E', 'ɚ': 'E', 'ɜ': 'E', 'ᵻ': 'E', 'j': 'E',
+    'o': 'O', 'ɔ': 'O', 'ɒ': 'O', 'oʊ': 'O', 'ɔɪ': 'O',
+    'u': 'U', 'ʊ': 'U', 'w': 'U',
+    'm': 'M', 'b': 'M', 'p': 'M',
+    'f': 'F', 'v': 'F',
+    'l': 'L', 'θ': 'L', 'ð': 'L', 't': 'L', 'd': 'L', 'n': 'L', 'ɾ': 'L',
+    's': 'S', 'z': 'S', 'ʃ': 'S', 'ʒ': 'S', 'tʃ': 'S', 'dʒ': 'S', 'k': 'S', 'g': 'S', 'ɡ': 'S',
+    'ŋ': 'S', 'h': 'S', 'ɹ': 'S', 'r': 'S',
+}
+
+# Spelling fallback when no phonemizer is installed; digraphs are matched first
+GRAPHEME_TO_VISEME = {
+    'th': 'L', 'sh': 'S', 'ch': 'S', 'ph': 'F', 'oo': 'U', 'ee': 'E', 'ea': 'E', 'ou': 'O', 'ow': 'O',
+    'a': 'A', 'e': 'E', 'i': 'E', 'y': 'E', 'o': 'O', 'u': 'U', 'w': 'U',
+    'm': 'M', 'b': 'M', 'p': 'M', 'f': 'F', 'v': 'F',
+    'l': 'L', 't': 'L', 'd': 'L', 'n': 'L',
+    's': 'S', 'z': 'S', 'c': 'S', 'k': 'S', 'g': 'S', 'j': 'S', 'q': 'S', 'x': 'S', 'r': 'S', 'h': 'S',
+}
+
+VOWEL_VISEMES = {'A', 'E', 'O', 'U'}
+PAUSE_CHARS = set(' ,.;:!?—-\n')
+
+def _tokenize(text: str, table: Dict[str, str]) -> List[str]:
+    """Greedy longest-match split of text into symbols from table; pauses become 'X'"""
+    symbols = []
+    i = 0
+    while i < len(text):
+        if text[i] in PAUSE_CHARS:
+            if not symbols or symbols[-1] != 'X':
+                symbols.append('X')
+            i += 1
+            continue
+        for size in (2, 1):
+            chunk = text[i:i + size]
+            if chunk in table:
+                symbols.append(table[chunk])
+                i += size
+                break
+        else:
+            i += 1  # Stress marks, length marks, digits...
+    return symbols
+
+def text_to_visemes(text: str, language: str = 'en-us') -> List[str]:
+    """
+    Viseme sequence for a text
+
+    Uses espeak-ng phonemes via piper-phonemize when available,
+    otherwise approximates from spelling.
+
+    Args:
+        text: Spoken text
+        language: espeak-ng voice
+
+    Returns:
+        List of viseme codes
+    """
+    try:
+        from piper_phonemize import phonemize_espeak
+        phonemes = ' '.join(''.join(sentence) for sentence in phonemize_espeak(text, language))
+        return _tokenize(phonemes, IPA_TO_VISEME)
+    except ImportError:
+        return _tokenize(text.lower(), GRAPHEME_TO_VISEME)
+
+def viseme_timeline(text: str, duration: float) -> List[Dict[str, object]]:
+    """
+    Time-aligned viseme track for synthesized speech
+
+    Durations are estimated: vowels get more time than consonants and pauses
+    less, then everything is scaled to the real audio length.
+
+    Args:
+        text: Text that was synthesized
+        duration: Audio length in seconds
+
+    Returns:
+        List of {'viseme', 'start', 'end'} with times in seconds
+    """
+    symbols = text_to_visemes(text)
+    if not symbols or duration <= 0:
+        return [{'viseme': 'X', 'start': 0.0, 'end': round(max(duration, 0.0), 3)}]
+
+    weights = [1.6 if s in VOWEL_VISEMES else 0.6 if s == 'X' else 1.0 for s in symbols]
+    scale = duration / sum(weights)
+
+    timeline = []
+    t = 0.0
+    for symbol, weight in zip(symbols, weights):
+        end = t + weight * scale
+        if timeline and timeline[-1]['viseme'] == symbol:
+            timeline[-1]['end'] = round(end, 3)
+        else:
+            timeline.append({'viseme': symbol, 'start': round(t, 3), 'end': round(end, 3)})
+        t = end
+    timeline[-1]['end'] = round(duration, 3)
+    return timeline
+
+def wav_duration(wav_bytes: bytes) -> float:
+    """Length in seconds of complete WAV bytes"""
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+        return wav.getnframes() / wav.getframerate()
@@ -1,25 +1,239 @@
-from ultralytics import YOLO
-import face_recognition
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import numpy as np
 import cv2
 
-model = YOLO('yolov8n.pt')
+# ultralytics and face_recognition are imported on first use: face pool workers never need
+# YOLO, and importing this module must stay cheap for spawned processes
+
+logger = logging.getLogger(__name__)
+
+class VisionModels:
+    """Loads YOLO once, on first use, pinned to one device"""
+
+    def __init__(self, weights='yolov8n.pt', device='auto', half=False, export_format=None, imgsz=640,
+                 face_options=None):
+        self.weights = weights
+        self.face_options = face_options or {}
+        self.device = self._resolve_device(device)
+        self.half = half and self.device != 'cpu'  # fp16 only pays off on GPU
+        self.export_format = export_format if self.device == 'cpu' else None
+        self.imgsz = imgsz
+        self._yolo = None
+        self._lock = threading.Lock()
+        self._predict_lock = threading.Lock()  # Ultralytics predictors are not thread-safe
+
+    @staticmethod
+    def _resolve_device(device):
+        if device != 'auto':
+            return device
+        import torch
+        if torch.cuda.is_available():
+            return 'cuda'
+        if torch.backends.mps.is_available():
+            return 'mps'
+        return 'cpu'
+
+    def _exported_path(self):
+        """Export the weights for CPU inference (ONNX/OpenVINO) once, reusing earlier exports"""
+        stem = os.path.splitext(self.weights)[0]
+        path = f'{stem}.onnx' if self.export_format == 'onnx' else f'{stem}_{self.export_format}_model'
+        if not os.path.exists(path):
+            from ultralytics import YOLO
+            logger.info(f"Exporting {self.weights} to {self.export_format}")
+            path = YOLO(self.weights).export(format=self.export_format, imgsz=self.imgsz)
+        return path
+
+    @property
+    def yolo(self):
+        with self._lock:
+            if self._yolo is None:
+                from ultralytics import YOLO
+                if self.export_format:
+                    self._yolo = YOLO(self._exported_path(), task='detect')
+                else:
+                    self._yolo = YOLO(self.weights)
+                    self._yolo.to(self.device)
+                logger.info(f"Loaded YOLO on {self.device} ({self.export_format or 'torch'}, half={self.half})")
+        return self._yolo
+
+    def detect(self, images):
+        """Run YOLO on one image or a list of images; calls from different threads are serialized"""
+        model = self.yolo
+        with self._predict_lock:
+            return model(images, device=self.device, half=self.half, imgsz=self.imgsz, verbose=False)
+
+    def warmup(self):
+        """Dummy inference so the first real request doesn't pay for JIT and allocation"""
+        self.detect(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+        logger.info("Vision models warmed up")
+
+_models = None
+_models_lock = threading.Lock()
+
+def get_models(config=None, device='auto'):
+    """Process-wide vision models, created on first use"""
+    global _models
+    with _models_lock:
+        if _models is None:
+            config = config or {}
+            requested = config.get('vision_device', 'auto')
+            _models = VisionModels(device=device if requested == 'auto' else requested,
+                                   half=config.get('vision_half', False),
+                                   export_format=config.get('vision_export'),
+                                   imgsz=config.get('vision_imgsz', 640),
+                                   face_options={'max_side': config.get('face_max_side', 1024),
+                                                 'tile_size': config.get('face_tile_size', 0),
+                                                 'tile_overlap': config.get('face_tile_overlap', 128)})
+    return _models
+
+_face_pool = None
+
+def _init_face_worker():
+    """
+    Face pool initializer: load face_recognition up front, nothing else
+
+    Spawned workers still re-import the parent's main module, so app.py
+    keeps heavy imports and model loading out of import time.
+    """
+    import face_recognition  # Loaded once per worker, before the first task
+    cv2.setNumThreads(1)  # One process per core already; avoid oversubscription
+
+def get_face_pool(workers=None):
+    """Process pool for face detection, which is CPU-bound and holds the GIL"""
+    global _face_pool
+    with _models_lock:
+        if _face_pool is None:
+            _face_pool = ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_face_worker)
+    return _face_pool
+
+def decode_image(data):
+    """Decode uploaded image bytes to a BGR array, or None if they are not an image"""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def _box_iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area = lambda box: (box[2] - box[0]) * (box[1] - box[3])
+    return inter / float(area(a) + area(b) - inter) if inter else 0.0
+
+def _tiles(length, tile_size, overlap):
+    """Start offsets covering [0, length) with windows of tile_size"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap)
+    starts = list(range(0, length - tile_size, step))
+    return starts + [length - tile_size]
+
+def detect_faces(img, max_side=1024, tile_size=0, tile_overlap=128):
+    """
+    Face boxes in original image coordinates, as (top, right, bottom, left).
+
+    The BGR image is converted to RGB and downscaled so its long side is at most
+    max_side, since HOG cost grows with pixel count. With tile_size set, a working
+    image still larger than that is scanned in overlapping tiles and duplicate
+    boxes from the overlaps are merged.
+    """
+    import face_recognition
+    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    h, w = rgb.shape[:2]
+    scale = min(1.0, max_side / float(max(h, w))) if max_side else 1.0
+    if scale < 1.0:
+        rgb = cv2.resize(rgb, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    sh, sw = rgb.shape[:2]
+
+    if tile_size and max(sh, sw) > tile_size:
+        boxes = []
+        for y in _tiles(sh, tile_size, tile_overlap):
+            for x in _tiles(sw, tile_size, tile_overlap):
+                tile = np.ascontiguousarray(rgb[y:y + tile_size, x:x + tile_size])
+                for top, right, bottom, left in face_recognition.face_locations(tile):
+                    box = (top + y, right + x, bottom + y, left + x)
+                    if all(_box_iou(box, kept) < 0.5 for kept in boxes):
+                        boxes.append(box)
+    else:
+        boxes = face_recognition.face_locations(rgb)
+
+    return [(int(top / scale), int(right / scale), int(bottom / scale), int(left / scale))
+            for top, right, bottom, left in boxes]
+
+def count_faces(img, options=None):
+    options = get_models().face_options if options is None else options
+    return len(detect_faces(img, **options))
+
+def _count_faces_encoded(data, options):
+    """Face pool task; takes encoded bytes so only the compressed image crosses the process boundary"""
+    return count_faces(decode_image(data), options)
+
+def analyze_images(items, batch_size=8, face_workers=2):
+    """
+    Analyze many images: YOLO runs in batches, face detection in a process pool.
+
+    Args:
+        items: List of (name, encoded image bytes)
+        batch_size: Images per YOLO forward pass
+        face_workers: Face detection processes (None uses the CPU count)
+
+    Returns:
+        One result dict per item, in order
+    """
+    results = [{'name': name} for name, _ in items]
+    decoded = []
+    for i, (name, data) in enumerate(items):
+        img = decode_image(data)
+        if img is None:
+            results[i]['error'] = 'Invalid image'
+        else:
+            decoded.append((i, img))
+
+    # Faces run in other processes while YOLO runs here
+    models = get_models()
+    pool = get_face_pool(face_workers)
+    face_jobs = {i: pool.submit(_count_faces_encoded, items[i][1], models.face_options) for i, _ in decoded}
+
+    for start in range(0, len(decoded), batch_size):
+        batch = decoded[start:start + batch_size]
+        for (i, _), r in zip(batch, models.detect([img for _, img in batch])):
+            results[i]['objects'] = [r.names[int(c)] for c in r.boxes.cls]
+
+    for i, job in face_jobs.items():
+        try:
+            results[i]['faces'] = job.result()
+        except Exception as e:
+            results[i]['error'] = f'Face detection failed: {e}'
+    return results
 
 def analyze_image(image_path, use_webcam=False):
     if use_webcam:
-        cap = cv2.VideoCapture(0)
-        ret, frame = cap.read()
-        img = frame if ret else None
-        cap.release()
+        from webcam import get_service
+        service = get_service()
+        if service.running:
+            img, _ = service.latest_frame()  # Camera is already open
+        else:
+            cap = cv2.VideoCapture(0)
+            ret, frame = cap.read()
+            img = frame if ret else None
+            cap.release()
     else:
         img = cv2.imread(image_path)
     if img is None:
         raise ValueError("Invalid image")
+    return analyze_frame(img)
 
+def analyze_frame(img):
+    """Objects and face count for a decoded BGR image"""
     # Objects
-    results = model(img)
+    results = get_models().detect(img)
     objects = [r.names[int(c)] for r in results for c in r.boxes.cls]
 
     # Faces
-    faces = face_recognition.face_locations(img)
+    faces = count_faces(img)
 
-    return {'objects': objects, 'faces': len(faces)}
\ No newline at end of file
+    return {'objects': objects, 'faces': faces}
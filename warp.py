@@ -1,17 +1,137 @@
 import cv2
 import numpy as np
 
+# MediaPipe FaceMesh lip contours, left corner to right corner
+UPPER_LIP = (185, 40, 39, 37, 0, 267, 269, 270, 409,  # Outer
+             191, 80, 81, 82, 13, 312, 311, 310, 415)  # Inner
+LOWER_LIP = (146, 91, 181, 84, 17, 314, 405, 321, 375,  # Outer
+             95, 88, 178, 87, 14, 317, 402, 318, 324)  # Inner
+CORNERS = (61, 291, 78, 308)
+INNER_LIP = (78, 191, 80, 81, 82, 13, 312, 311, 310, 415, 308, 324, 318, 402, 317, 14, 87, 178, 88, 95)
+LIP_POINTS = CORNERS + UPPER_LIP + LOWER_LIP
+
+# Per-viseme mouth shape, in fractions of mouth width:
+#   open: how far the lower lip drops (the upper lip rises by a third of that)
+#   widen: horizontal stretch about the mouth centre (negative rounds the lips)
+VISEME_SHAPES = {
+    'X': (0.0, 0.0),
+    'A': (0.45, 0.05),
+    'E': (0.15, 0.15),
+    'O': (0.35, -0.15),
+    'U': (0.12, -0.25),
+    'M': (-0.04, 0.0),
+    'F': (0.06, 0.02),
+    'L': (0.2, 0.02),
+    'S': (0.08, 0.1),
+}
+
+def mouth_roi(landmarks, shape, pad=0.6):
+    """Padded mouth bounding box (x0, y0, x1, y1) in pixels"""
+    h, w = shape[:2]
+    pts = np.array([(landmarks[i][0] * w, landmarks[i][1] * h) for i in LIP_POINTS])
+    (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+    margin = pad * (x1 - x0)
+    return (max(0, int(x0 - margin)), max(0, int(y0 - margin)),
+            min(w, int(np.ceil(x1 + margin))), min(h, int(np.ceil(y1 + margin))))
+
+def _anchors(w, h):
+    """Fixed points on the ROI border so the warp blends seamlessly into the frame"""
+    xs, ys = (0, (w - 1) / 2, w - 1), (0, (h - 1) / 2, h - 1)
+    return [(x, y) for x in xs for y in ys if x != xs[1] or y != ys[1]]
+
+def _triangulate(points, w, h):
+    """Delaunay triangles over points, as index triples"""
+    subdiv = cv2.Subdiv2D((0, 0, w + 1, h + 1))
+    for x, y in points:
+        subdiv.insert((float(x), float(y)))
+    triangles = []
+    for tri in subdiv.getTriangleList().reshape(-1, 3, 2):
+        idx = tuple(int(np.argmin(((points - p) ** 2).sum(axis=1))) for p in tri)
+        if len(set(idx)) == 3:
+            triangles.append(idx)
+    return triangles
+
+def _deform(points, n_lip, shape):
+    """Move the lip points (the first n_lip of points) into a viseme shape"""
+    open_, widen = shape
+    lips = points[:n_lip]
+    left, right = lips[0], lips[1]  # Outer corners
+    center = (left + right) / 2
+    half_width = max(1.0, np.linalg.norm(right - left) / 2)
+    dst = points.copy()
+    n_upper = len(UPPER_LIP)
+    for i in range(len(CORNERS), n_lip):
+        dx = (lips[i][0] - center[0]) / half_width
+        weight = max(0.0, 1.0 - dx * dx)  # Corners stay put, the middle moves most
+        dy = open_ * 2 * half_width * weight
+        dst[i, 1] += -dy / 3 if i < len(CORNERS) + n_upper else dy
+    dst[:n_lip, 0] = center[0] + (dst[:n_lip, 0] - center[0]) * (1 + widen)
+    return dst
+
+def _warp_triangle(src, out, src_tri, dst_tri):
+    """Affine-warp one triangle of src onto out"""
+    x, y, w, h = cv2.boundingRect(np.float32([src_tri]))
+    dx, dy, dw, dh = cv2.boundingRect(np.float32([dst_tri]))
+    if w == 0 or h == 0 or dw == 0 or dh == 0:
+        return
+    M = cv2.getAffineTransform(np.float32(src_tri - (x, y)), np.float32(dst_tri - (dx, dy)))
+    patch = cv2.warpAffine(src[y:y + h, x:x + w], M, (dw, dh), flags=cv2.INTER_LINEAR,
+                           borderMode=cv2.BORDER_REFLECT_101)
+    mask = np.zeros((dh, dw), dtype=np.float32)
+    cv2.fillConvexPoly(mask, np.int32(np.round(dst_tri - (dx, dy))), 1.0, cv2.LINE_AA)
+    mask = mask[..., None] if out.ndim == 3 else mask
+    region = out[dy:dy + dh, dx:dx + dw]
+    region[:] = region * (1 - mask) + patch * mask
+
+def warp_lip_rois(image, visemes, landmarks, pad=0.6):
+    """
+    Lip-region crops for each viseme
+
+    Only the padded mouth box is warped: lip landmarks are moved into the
+    viseme shape and the ROI is deformed piecewise-affinely over a Delaunay
+    mesh anchored to the ROI border, so cost scales with mouth size.
+
+    Returns:
+        (x0, y0, x1, y1) box and one crop per viseme
+    """
+    x0, y0, x1, y1 = mouth_roi(landmarks, image.shape, pad)
+    roi = image[y0:y1, x0:x1]
+    h, w = roi.shape[:2]
+    lips = np.array([(landmarks[i][0] * image.shape[1] - x0, landmarks[i][1] * image.shape[0] - y0)
+                     for i in LIP_POINTS])
+    points = np.vstack([lips, _anchors(w, h)])
+    triangles = _triangulate(points, w, h)
+    inner = [LIP_POINTS.index(i) for i in INNER_LIP]
+
+    crops, rendered = [], {}
+    for viseme in visemes:
+        shape = VISEME_SHAPES.get(viseme, VISEME_SHAPES['X'])
+        if shape not in rendered:
+            if shape == VISEME_SHAPES['X']:
+                rendered[shape] = roi.copy()
+            else:
+                dst = _deform(points, len(lips), shape)
+                dst[:, 0] = dst[:, 0].clip(0, w - 1)
+                dst[:, 1] = dst[:, 1].clip(0, h - 1)
+                out = roi.astype(np.float32)
+                src = roi.astype(np.float32)
+                for a, b, c in triangles:
+                    _warp_triangle(src, out, points[[a, b, c]], dst[[a, b, c]])
+                if shape[0] > 0:
+                    # Darken the opened mouth interior
+                    mask = np.zeros((h, w), dtype=np.float32)
+                    cv2.fillPoly(mask, [np.int32(np.round(dst[inner]))], 0.6, cv2.LINE_AA)
+                    out *= 1 - (mask[..., None] if out.ndim == 3 else mask)
+                rendered[shape] = np.clip(out, 0, 255).astype(image.dtype)
+        crops.append(rendered[shape])
+    return (x0, y0, x1, y1), crops
+
 def warp_lips(image_path, visemes, landmarks):
     image = cv2.imread(image_path)
+    (x0, y0, x1, y1), crops = warp_lip_rois(image, visemes, landmarks)
     frames = []
-    for viseme in visemes:
-        # Assume lip indices from landmarks (e.g., 48-68)
-        lip_pts = np.array([(landmarks[i][0] * image.shape[1], landmarks[i][1] * image.shape[0]) for i in range(48, 68)], dtype=np.float32)
-        # Simple warp for viseme
-        if viseme == 'A':
-            lip_pts[:, 1] += 10  # Open mouth
-        # Use cv2 to warp region
-        M = cv2.estimateAffinePartial2D(lip_pts, lip_pts)[0]
-        warped = cv2.warpAffine(image, M, (image.shape[1], image.shape[0]))
-        frames.append(warped)
-    return frames
\ No newline at end of file
+    for crop in crops:
+        frame = image.copy()
+        frame[y0:y1, x0:x1] = crop  # Composite the warped mouth back in
+        frames.append(frame)
+    return frames
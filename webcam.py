@@ -0,0 +1,167 @@
+"""
+Webcam vision service for Local AI Avatar
+Holds the camera open and runs detection in the background at a target frame rate
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+import cv2
+
+from vision import get_models, count_faces
+
+logger = logging.getLogger(__name__)
+
+class WebcamService:
+    """Continuous capture plus rate-limited detection on the newest frame"""
+
+    def __init__(self, device_index: int = 0, target_fps: float = 5.0, face_interval: int = 1):
+        """
+        Initialize webcam service
+
+        Args:
+            device_index: OpenCV camera index
+            target_fps: Detection passes per second to aim for
+            face_interval: Run face detection on every Nth detection pass
+        """
+        self.device_index = device_index
+        self.target_fps = target_fps
+        self.face_interval = max(1, face_interval)
+        self._cap = None
+        self._frame = None
+        self._frame_id = 0
+        self._frame_lock = threading.Lock()
+        self._result: Dict[str, object] = {}
+        self.last_error: Optional[str] = None
+        self._result_cond = threading.Condition()
+        self._running = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def start(self):
+        """Open the camera and start the capture and detection threads"""
+        if self.running:
+            return
+        self._cap = cv2.VideoCapture(self.device_index)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            raise RuntimeError(f"Could not open camera {self.device_index}")
+        self._running.set()
+        self._threads = [threading.Thread(target=self._capture_loop, name='webcam-capture', daemon=True),
+                         threading.Thread(target=self._detect_loop, name='webcam-detect', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Webcam service started on camera {self.device_index} at {self.target_fps} fps")
+
+    def stop(self):
+        """Stop both threads and release the camera"""
+        if not self.running:
+            return
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(5)
+        self._cap.release()
+        self._cap = None
+        with self._result_cond:
+            self._result_cond.notify_all()
+        logger.info("Webcam service stopped")
+
+    def _capture_loop(self):
+        """Read frames as fast as the camera delivers them, keeping only the newest"""
+        while self.running:
+            ret, frame = self._cap.read()
+            if not ret:
+                time.sleep(0.05)
+                continue
+            with self._frame_lock:
+                self._frame = frame
+                self._frame_id += 1
+
+    def latest_frame(self):
+        """Newest captured frame (or None) and its id"""
+        with self._frame_lock:
+            return self._frame, self._frame_id
+
+    def _detect_loop(self):
+        """Detect on the newest frame; frames arriving while busy are skipped"""
+        models = get_models()
+        interval = 1.0 / self.target_fps
+        last_id, passes, faces, skipped = 0, 0, 0, 0
+        fps = 0.0
+        while self.running:
+            started = time.perf_counter()
+            frame, frame_id = self.latest_frame()
+            if frame is None or frame_id == last_id:
+                time.sleep(0.01)
+                continue
+            skipped += max(0, frame_id - last_id - 1)
+            last_id = frame_id
+
+            try:
+                results = models.detect(frame)
+                objects = [r.names[int(c)] for r in results for c in r.boxes.cls]
+                if passes % self.face_interval == 0:
+                    faces = count_faces(frame)
+            except Exception as e:
+                # One bad frame must not kill the thread while `running` stays set
+                logger.error(f"Webcam detection failed on frame {frame_id}: {e}")
+                self.last_error = str(e)
+                time.sleep(interval)
+                continue
+            passes += 1
+            self.last_error = None
+
+            elapsed = time.perf_counter() - started
+            fps = 0.8 * fps + 0.2 / max(elapsed, interval) if fps else 1.0 / max(elapsed, interval)
+            with self._result_cond:
+                self._result = {'objects': objects, 'faces': faces, 'frame_id': frame_id,
+                                'timestamp': time.time(), 'fps': round(fps, 2), 'skipped_frames': skipped}
+                self._result_cond.notify_all()
+            # Sleep off whatever is left of the frame budget; if inference overran it we go straight on
+            time.sleep(max(0.0, interval - elapsed))
+
+    def latest(self) -> Dict[str, object]:
+        """Most recent detection result (empty until the first pass completes), plus any current error"""
+        with self._result_cond:
+            result = dict(self._result)
+        if self.last_error:
+            result['error'] = self.last_error
+        return result
+
+    def wait_for_update(self, last_frame_id: int, timeout: float = 5.0) -> Optional[Dict[str, object]]:
+        """
+        Block until a result newer than last_frame_id is available
+
+        Args:
+            last_frame_id: frame_id of the result the caller already has
+            timeout: Seconds to wait
+
+        Returns:
+            New result, or None on timeout or shutdown
+        """
+        with self._result_cond:
+            self._result_cond.wait_for(
+                lambda: not self.running or self._result.get('frame_id', 0) > last_frame_id, timeout)
+            if self.running and self._result.get('frame_id', 0) > last_frame_id:
+                return dict(self._result)
+        return None
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service(config=None) -> WebcamService:
+    """Process-wide webcam service, created on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = config or {}
+            _service = WebcamService(device_index=config.get('webcam_device', 0),
+                                     target_fps=config.get('webcam_fps', 5),
+                                     face_interval=config.get('webcam_face_interval', 2))
+    return _service